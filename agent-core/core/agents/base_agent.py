@@ -42,18 +42,21 @@ class BaseMobileAgent(ABC):
     def invoke(
         self,
         images: Optional[List[str]] = None,
-        messages: Optional[List[dict]] = None
+        messages: Optional[List[dict]] = None,
+        prompt: Optional[str] = None
     ) -> tuple[str, Optional[Any], Any]:
         """调用Agent
         
         Args:
             images: 图片列表（路径）
             messages: 可选的消息历史
+            prompt: 预先生成的提示（为None时调用get_prompt生成）
             
         Returns:
             (输出文本, 消息历史, 原始响应)
         """
-        prompt = self.get_prompt()
+        if prompt is None:
+            prompt = self.get_prompt()
         
         if images is None:
             images = []
@@ -79,6 +82,10 @@ class BaseMobileAgent(ABC):
             解析后的结果字典
         """
         output, msg_history, raw_response = self.invoke(images)
+        return self.build_result(output, msg_history, raw_response)
+    
+    def build_result(self, output: str, msg_history: Optional[Any], raw_response: Any) -> Dict[str, Any]:
+        """解析invoke的返回值，并附加原始响应与消息历史"""
         parsed = self.parse_response(output)
         parsed["_raw_response"] = raw_response
         parsed["_msg_history"] = msg_history
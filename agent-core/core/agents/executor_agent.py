@@ -248,11 +248,7 @@ class ExecutorAgent(BaseMobileAgent):
         if state.execution.action_history:
             section += "Actions you have previously executed and whether they succeeded:\n"
             num_actions = min(5, len(state.execution.action_history))
-            recent_actions = state.execution.action_history[-num_actions:]
-            recent_summary = state.execution.summary_history[-num_actions:]
-            recent_outcomes = state.execution.action_outcomes[-num_actions:]
-            error_descriptions = state.execution.error_descriptions[-num_actions:]
-            for act, summ, outcome, err_des in zip(recent_actions, recent_summary, recent_outcomes, error_descriptions):
+            for act, summ, outcome, err_des in self.state_manager.get_recent_actions(num_actions):
                 if outcome == "S":
                     section += f"Action: {act} | Description: {summ} | Outcome: Success\n"
                 else:
@@ -2,7 +2,7 @@
 from typing import Dict, Any
 import re
 from .base_agent import BaseMobileAgent
-from core.state.state_manager import StateManager
+from core.state.state_manager import StateManager, NO_COMPLETED_SUBGOAL_SENTINELS
 from infrastructure.llm.llm_provider import LLMProvider
 
 
@@ -95,10 +95,7 @@ class PlannerAgent(BaseMobileAgent):
                 prompt += "### Task Potentially Stuck! ###\n"
                 prompt += "You have encountered consecutive failures. The following are recent failure logs:\n"
                 k = state.planning.err_to_planner_thresh
-                recent_actions = state.execution.action_history[-k:]
-                recent_summaries = state.execution.summary_history[-k:]
-                recent_err_des = state.execution.error_descriptions[-k:]
-                for i, (act, summ, err_des) in enumerate(zip(recent_actions, recent_summaries, recent_err_des)):
+                for i, (act, summ, _, err_des) in enumerate(self.state_manager.get_recent_actions(k)):
                     prompt += f"- Attempt: Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
             
             prompt += "---\n"
@@ -145,7 +142,7 @@ class PlannerAgent(BaseMobileAgent):
         
         # Compatibility handling: handle both Chinese and English variants
         # Also handle empty string cases
-        if completed_subgoal in ["", "无已完成子目标。", "无已完成子目标", "No completed subgoal.", "No completed subgoal"]:
+        if not completed_subgoal or completed_subgoal in NO_COMPLETED_SUBGOAL_SENTINELS:
             completed_subgoal = "No completed subgoal."
         
         if "### Plan ###" in response:
@@ -1,36 +1,74 @@
 """规划Chain：连接PlannerAgent和状态更新"""
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
 from typing import Dict, Any, Optional, List
 from core.agents.planner_agent import PlannerAgent
 from core.state.state_manager import StateManager
+from infrastructure.storage.response_cache import ResponseCache
+import os
 import re
+import json
+import hashlib
+
+
+@dataclass
+class SpeculativePlan:
+    """预先提交的规划请求：仅当提示与截图均未变化时才会被采用"""
+    prompt: str
+    images: List[str]
+    future: Future
 
 
 class PlanningChain:
     """规划Chain：负责规划阶段的处理"""
     
-    def __init__(self, planner_agent: PlannerAgent, state_manager: StateManager):
+    def __init__(
+        self,
+        planner_agent: PlannerAgent,
+        state_manager: StateManager,
+        plan_cache: Optional[ResponseCache] = None
+    ):
         """初始化规划Chain
         
         Args:
             planner_agent: Planner Agent
             state_manager: 状态管理器
+            plan_cache: 规划缓存（可选，规划提示与界面DOM均一致时复用之前的规划结果）
         """
         self.planner_agent = planner_agent
         self.state_manager = state_manager
+        self.plan_cache = plan_cache
+    
+    def speculate(self, screenshot_path: Optional[str], executor: Executor) -> SpeculativePlan:
+        """基于当前状态提前提交规划请求（不修改状态）
+        
+        Args:
+            screenshot_path: 截图路径
+            executor: 执行LLM调用的线程池
+            
+        Returns:
+            SpeculativePlan，交由run的speculative参数决定是否采用
+        """
+        images = [screenshot_path] if screenshot_path else []
+        prompt = self.planner_agent.get_prompt()
+        future = executor.submit(self.planner_agent.invoke, images, None, prompt)
+        return SpeculativePlan(prompt=prompt, images=images, future=future)
     
     def run(
         self,
         screenshot_path: Optional[str] = None,
-        skip_if_invalid: bool = False
+        skip_if_invalid: bool = False,
+        speculative: Optional[SpeculativePlan] = None
     ) -> Dict[str, Any]:
         """运行规划Chain
         
         Args:
             screenshot_path: 截图路径
             skip_if_invalid: 如果上一轮动作为invalid，是否跳过规划
+            speculative: 预先提交的规划请求，提示与截图一致时复用其结果
             
         Returns:
-            规划结果字典
+            规划结果字典（_speculative_hit / _plan_cache_hit 标记是否复用了预先提交的结果或缓存的规划）
         """
         # 检查是否需要跳过规划
         if skip_if_invalid:
@@ -48,8 +86,40 @@ class PlanningChain:
         if screenshot_path:
             images.append(screenshot_path)
         
-        # 调用Planner Agent
-        result = self.planner_agent.run(images)
+        # 调用Planner Agent（优先复用预先提交的请求，其次复用相同局面的缓存规划）
+        prompt = self.planner_agent.get_prompt() if speculative is not None or self.plan_cache is not None else None
+        speculative_hit = (
+            speculative is not None
+            and speculative.images == images
+            and speculative.prompt == prompt
+        )
+        cache_key = None
+        cached = None
+        if self.plan_cache is not None and screenshot_path:
+            cache_key = self._plan_cache_key(prompt, os.path.splitext(screenshot_path)[0] + ".xml")
+        if speculative_hit:
+            result = self.planner_agent.build_result(*speculative.future.result())
+        else:
+            if cache_key:
+                cached = self._load_cached_plan(cache_key)
+            if cached is not None:
+                result = {
+                    "thought": cached.get("thought", ""),
+                    "completed_subgoal": cached.get("completed_subgoal", "No completed subgoal."),
+                    "plan": cached.get("plan", ""),
+                    "_raw_response": None,
+                    "_msg_history": None
+                }
+            else:
+                result = self.planner_agent.run(images)
+        if cache_key and cached is None:
+            self.plan_cache.put(cache_key, json.dumps({
+                "thought": result.get("thought", ""),
+                "completed_subgoal": result.get("completed_subgoal", ""),
+                "plan": result.get("plan", "")
+            }, ensure_ascii=False))
+        result["_speculative_hit"] = speculative_hit
+        result["_plan_cache_hit"] = cached is not None
         
         # 更新状态
         new_completed_subgoal = result.get('completed_subgoal', 'No completed subgoal.')
@@ -71,6 +141,28 @@ class PlanningChain:
         
         return result
     
+    @staticmethod
+    def _plan_cache_key(prompt: str, dom_path: str) -> Optional[str]:
+        """规划缓存键：完整规划提示与界面DOM的SHA-256；没有DOM树时无法确认界面一致，返回None"""
+        try:
+            with open(dom_path, "rb") as f:
+                dom_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"plan|{prompt_hash}|{dom_hash}"
+
+    def _load_cached_plan(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的规划结果（thought/completed_subgoal/plan），未命中或内容无效时返回None"""
+        raw = self.plan_cache.get(cache_key)
+        if raw is None:
+            return None
+        try:
+            cached = json.loads(raw)
+        except ValueError:
+            return None
+        return cached if isinstance(cached, dict) else None
+
     def _update_current_subgoal(self, plan: str) -> None:
         """从计划中提取当前子目标并更新状态"""
         if plan and "Finished" not in plan:
@@ -289,7 +289,30 @@ class ReflectionChain:
             "_path_summarizer_raw_response": path_summarizer_raw_response,
             "_recorder_raw_response": recorder_raw_response
         }
-    
+
+    def skip(self) -> Dict[str, Any]:
+        """跳过反思（如answer动作不会改变屏幕），仅更新进度状态并返回合成的成功结果
+
+        Returns:
+            与run结构一致的反思结果字典（outcome为"S"）
+        """
+        state = self.state_manager.get_state()
+        self.state_manager.set_progress_status(state.planning.completed_plan_summary)
+        return {
+            "outcome": "S",
+            "error_description": "",
+            "action_outcome": "S",
+            "llm_outcome": "S",
+            "tree_similarity": None,
+            "tree_confirmed": None,
+            "tree_before_xml": None,
+            "tree_after_xml": None,
+            "final_outcome": "S",
+            "_reflector_raw_response": None,
+            "_path_summarizer_raw_response": None,
+            "_recorder_raw_response": None
+        }
+
     def _run_path_summarizer(self) -> Any:
         """运行PathSummarizer"""
         if not self.path_summarizer_agent:
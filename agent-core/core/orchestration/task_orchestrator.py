@@ -2,12 +2,16 @@
 import os
 import re
 import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from PIL import Image
 
 from core.state.state_manager import StateManager
-from core.chains.planning_chain import PlanningChain
+from core.chains.planning_chain import PlanningChain, SpeculativePlan
 from core.chains.execution_chain import ExecutionChain
 from core.chains.reflection_chain import ReflectionChain
 from core.agents.planner_agent import PlannerAgent
@@ -19,31 +23,72 @@ from core.agents.path_summarizer_agent import PathSummarizerAgent
 from infrastructure.llm.llm_provider import LLMProvider
 from infrastructure.device.device_controller import DeviceController
 from infrastructure.storage.log_service import LogService
-from infrastructure.storage.report_service import ReportService
+from infrastructure.storage.report_service import ReportService, SubgoalRecord
+from infrastructure.storage.response_cache import ResponseCache, default_cache_path
 from services.screenshot_service import ScreenshotService
 from services.action_service import ActionService
 from services.coordinate_service import CoordinateService
 from core.actions import ANSWER
 from core.agents.executor_agent import INPUT_KNOW
+from core.orchestration.workflow import Phase, WorkflowGraph
+
+
+_ANSWER_STEP_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"\s*\d+\.\s*perform the `answer` action\.?",
+    r"\s*\d+\.\s*perform the answer action\.?",
+    r"\s*perform the `answer` action\.?",
+    r"\s*perform the answer action\.?",
+    r"\s*\d+\.\s*执行 `answer` 动作\.?",
+    r"\s*\d+\.\s*执行 answer 动作\.?",
+    r"\s*执行 `answer` 动作\.?",
+    r"\s*执行 answer 动作\.?",
+))
 
 
 def _strip_answer_step(s: str) -> str:
     """移除计划中的answer步骤（用于显示）"""
-    patterns = [
-        r"\s*\d+\.\s*perform the `answer` action\.?",
-        r"\s*\d+\.\s*perform the answer action\.?",
-        r"\s*perform the `answer` action\.?",
-        r"\s*perform the answer action\.?",
-        r"\s*\d+\.\s*执行 `answer` 动作\.?",
-        r"\s*\d+\.\s*执行 answer 动作\.?",
-        r"\s*执行 `answer` 动作\.?",
-        r"\s*执行 answer 动作\.?",
-    ]
-    for p in patterns:
-        s = re.compile(p, re.IGNORECASE).sub(" ", s)
+    for p in _ANSWER_STEP_PATTERNS:
+        s = p.sub(" ", s)
     return " ".join(s.split())
 
 
+# token统计来源：(响应属性, 嵌套字段)；嵌套字段为None时属性可为对象或dict，否则必须为dict
+_TOKEN_SOURCES = (
+    ("usage", None),
+    ("usage_metadata", ()),
+    ("response_metadata", ("token_usage", "usage")),
+)
+_TOKEN_KEY_ALIASES = {
+    "prompt": ("prompt_tokens", "input_tokens"),
+    "completion": ("completion_tokens", "output_tokens"),
+    "total": ("total_tokens",),
+}
+
+
+def _first_token_value(obj: Any, keys: tuple) -> Any:
+    """按顺序返回obj中第一个非空字段（兼容dict与对象）"""
+    for key in keys:
+        value = obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+        if value:
+            return value
+    return None
+
+
+@dataclass
+class _RunContext:
+    """单次run的状态机上下文"""
+    instruction: str
+    max_step: int
+    start_time: datetime
+    step: int = 0
+    before_image: Optional[str] = None
+    after_image: Optional[str] = None
+    current_step_text: str = ""
+    planning_result: Optional[Dict[str, Any]] = None
+    execution_result: Optional[Dict[str, Any]] = None
+    speculative_plan: Optional[SpeculativePlan] = None
+
+
 class TaskOrchestrator:
     """任务编排器类"""
     
@@ -63,6 +108,10 @@ class TaskOrchestrator:
         perception_mode: str = "vllm",
         enable_tree_stagnation_check: bool = False,
         tree_similarity_threshold: float = 0.9,
+        enable_speculative_planning: bool = False,
+        skip_reflection_on_answer: bool = True,
+        enable_plan_cache: bool = False,
+        plan_cache_dir: Optional[str] = None,
     ):
         """初始化任务编排器
         
@@ -78,6 +127,10 @@ class TaskOrchestrator:
             coor_type: 坐标类型
             enable_notetaker: 是否启用Notetaker
             perception_mode: 感知模式 ("vllm" 或 "som")
+            enable_speculative_planning: 是否在反思期间提前提交下一步的规划请求
+            skip_reflection_on_answer: answer动作后是否跳过截图与反思（屏幕不会变化）
+            enable_plan_cache: 是否在相同局面（规划提示与界面DOM一致）下复用缓存的规划结果
+            plan_cache_dir: 规划缓存目录（默认使用 ~/.scenagent/plan_cache.db）
         """
         self.llm_provider = llm_provider
         self.summary_llm_provider = summary_llm_provider or llm_provider
@@ -91,8 +144,11 @@ class TaskOrchestrator:
         self.enable_notetaker = enable_notetaker
         self.enable_task_judge = bool(enable_task_judge)
         self.perception_mode = perception_mode
+        # script记录中的模式标记在构造时按感知模式确定，避免每步比较模式字符串
+        self._script_mode = "som" if perception_mode == "som" else ""
         self.enable_tree_stagnation_check = bool(enable_tree_stagnation_check)
         self.tree_similarity_threshold = float(tree_similarity_threshold or 0.0)
+        self.skip_reflection_on_answer = bool(skip_reflection_on_answer)
         
         # 创建Agents
         self.planner_agent = PlannerAgent(llm_provider, state_manager)
@@ -103,7 +159,13 @@ class TaskOrchestrator:
         self.path_summarizer_agent = PathSummarizerAgent(self.summary_llm_provider, state_manager)
         
         # 创建Chains
-        self.planning_chain = PlanningChain(self.planner_agent, state_manager)
+        self.planning_chain = PlanningChain(
+            self.planner_agent,
+            state_manager,
+            ResponseCache(
+                os.path.join(plan_cache_dir, "plans.db") if plan_cache_dir else default_cache_path("plan_cache.db")
+            ) if enable_plan_cache else None
+        )
         self.execution_chain = ExecutionChain(
             self.executor_agent,
             state_manager,
@@ -132,7 +194,17 @@ class TaskOrchestrator:
         self.execution_history: List[str] = []
         self._last_command_str = None
         self._last_som_mark = None
-        self.token_usage_by_role: Dict[str, Dict[str, int]] = {}
+        # 上次生成的显示用总计划：(已完成计划, 剩余计划, 结果)，计划未变时跳过正则处理
+        self._total_plan_cache: Tuple[Optional[str], Optional[str], str] = (None, None, "")
+        self.token_usage_by_role: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        )
+        self._token_lock = threading.Lock()
+        self._speculation_pool = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-planner")
+            if enable_speculative_planning else None
+        )
+        self.workflow = self._build_workflow()
     
     def run(
         self,
@@ -155,119 +227,213 @@ class TaskOrchestrator:
         )
         self.state_manager.set_perception_mode(self.perception_mode)
         
-        start_time = datetime.now()
-        local_image_dir = None
-        local_image_dir2 = None
+        ctx = _RunContext(instruction=instruction, max_step=max_step, start_time=datetime.now())
+        try:
+            final_phase = self.workflow.run(ctx, Phase.PLANNING)
+        finally:
+            self._discard_speculative_plan(ctx.speculative_plan)
+            ctx.speculative_plan = None
+            self.log_service.flush()
         
-        for step in range(max_step):
-            planning_result = None
-            # 重置当前步骤的新完成子目标
-            self.state_manager.reset_current_step_completed_subgoal()
-            
-            # 获取截图
-            if step == 0:
-                local_image_dir = self.screenshot_service.take_screenshot()
-            else:
-                local_image_dir = local_image_dir2
-            
-            if not local_image_dir:
-                # 截图失败，保存结果并退出
-                self._save_final_results(start_time, instruction, step_limit=1.0)
-                self.device_controller.home()
-                return self.log_service.log_dir
-            
-            # 获取屏幕尺寸
-            size = self.screenshot_service.get_image_size(local_image_dir)
-            if not size:
-                continue
-            width, height = size
-            
-            # 检查错误阈值
-            self.state_manager.set_error_flag_plan(
-                self.state_manager.check_error_threshold()
+        if final_phase is Phase.ABORTED:
+            # 截图失败，保存结果并退出
+            self._save_final_results(ctx.start_time, instruction, step_limit=1.0)
+            self.device_controller.home()
+            return self.log_service.log_dir
+        
+        # 检查是否达到最大步数
+        if not os.path.exists(os.path.join(self.log_service.log_dir, "task_results.json")):
+            self._save_final_results(ctx.start_time, instruction, step_limit=1.0)
+        
+        # 补录最后一步的subgoal
+        # 如果当前循环结束时，还有一个current_subgoal正在进行中（即Operator执行了动作但Planner还没来得及确认完成）
+        # 我们通常认为这个动作是为了完成当前的current_subgoal
+        # 注意：这里我们使用 state_manager.get_current_subgoal() 而不是 completed_subgoal
+        state = self.state_manager.get_state()
+        current_subgoal = state.planning.current_subgoal
+        if current_subgoal and self._last_command_str:
+            self._append_script_subgoal(current_subgoal, self._last_command_str, self._last_som_mark)
+
+        # 保存最终数据
+        self._save_script_and_infopool()
+        self.device_controller.home()
+        
+        return self.log_service.log_dir
+    
+    def _build_workflow(self) -> WorkflowGraph:
+        """构建编排状态机"""
+        workflow = WorkflowGraph()
+        workflow.add_node(
+            Phase.PLANNING, self._plan_step,
+            outputs=("before_image", "planning_result")
+        )
+        workflow.add_node(
+            Phase.JUDGING, self._finish_step,
+            inputs=("before_image",)
+        )
+        workflow.add_node(
+            Phase.EXECUTING, self._execute_step,
+            inputs=("before_image",), outputs=("execution_result",)
+        )
+        workflow.add_node(
+            Phase.CAPTURING, self._capture_step,
+            inputs=("execution_result",), outputs=("after_image",)
+        )
+        workflow.add_node(
+            Phase.REFLECTING, self._reflect_step,
+            inputs=("before_image", "after_image", "execution_result")
+        )
+        return workflow
+
+    def _next_step(self, ctx: "_RunContext") -> Phase:
+        """进入下一步的规划阶段"""
+        ctx.step += 1
+        return Phase.PLANNING
+
+    def _discard_speculative_plan(self, speculative: Optional[SpeculativePlan]) -> None:
+        """丢弃未被采用的预先规划；已发出的请求仍计入token统计"""
+        if speculative is None or speculative.future.cancel():
+            return
+
+        def _account(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._accumulate_tokens("planner", future.result()[2])
+
+        speculative.future.add_done_callback(_account)
+
+    def _plan_step(self, ctx: "_RunContext") -> Phase:
+        """PLANNING：获取截图、检查错误阈值并运行Planner"""
+        if ctx.step >= ctx.max_step:
+            return Phase.DONE
+        step = ctx.step
+        ctx.planning_result = None
+        ctx.execution_result = None
+        # 重置当前步骤的新完成子目标
+        self.state_manager.reset_current_step_completed_subgoal()
+
+        # 获取截图
+        if step == 0:
+            ctx.before_image = self.screenshot_service.take_screenshot()
+        else:
+            ctx.before_image = ctx.after_image
+
+        if not ctx.before_image:
+            return Phase.ABORTED
+
+        # 获取屏幕尺寸
+        size = self.screenshot_service.get_image_size(ctx.before_image)
+        if not size:
+            return self._next_step(ctx)
+
+        # 检查错误阈值
+        self.state_manager.set_error_flag_plan(
+            self.state_manager.check_error_threshold()
+        )
+
+        # 规划阶段
+        skip_planner = False
+        if not self.state_manager.get_error_flag_plan():
+            last_action = self.state_manager.get_last_action()
+            if last_action and last_action.get('action') == 'invalid':
+                skip_planner = True
+
+        speculative = ctx.speculative_plan
+        ctx.speculative_plan = None
+        if not skip_planner:
+            print("\n ---INFO-Planner Agent---\n")
+            planning_result = self.planning_chain.run(
+                ctx.before_image,
+                skip_if_invalid=False,
+                speculative=speculative
             )
-            
-            # 规划阶段
-            skip_planner = False
-            if not self.state_manager.get_error_flag_plan():
-                last_action = self.state_manager.get_last_action()
-                if last_action and last_action.get('action') == 'invalid':
-                    skip_planner = True
-            
-            if not skip_planner:
-                print("\n ---INFO-Planner Agent---\n")
-                planning_result = self.planning_chain.run(
-                    local_image_dir,
-                    skip_if_invalid=False
-                )
-                self._accumulate_tokens("planner", planning_result.get("_raw_response"))
-                
-                # 保存规划结果
-                self.log_service.save_step_message(
-                    step + 1,
-                    "planner",
-                    None,  # messages将在后续版本中保存
-                    planning_result.get('thought', '') + "\n" + planning_result.get('plan', '')
-                )
-                self.log_service.append_chat_log("planner", planning_result.get('plan', ''), step + 1)
-                
-                print('New completed subgoal (from Planner): ' + planning_result.get('completed_subgoal', ''))
-                print('Completed subgoal summary (used by Planner): ' + (
-                    self.state_manager.get_state().planning.completed_plan_summary
-                    if self.state_manager.get_state().planning.completed_plan_summary not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]
-                    else "No completed subgoal summary."
-                ))
-                print('Planning thought: ' + planning_result.get('thought', ''))
-                print('Plan: ' + planning_result.get('plan', ''), "\n")
-
-                # self._update_script_data(step, self._last_command_str)
-                self._last_command_str = None
-            
-            # 检查是否完成
-            plan = self.state_manager.get_plan()
-            if "Finished" in plan.strip() and len(plan.strip()) < 15:
-                print("Instruction finished, evaluating task result...")
-                self._update_script_data(step, self._last_command_str, self._last_som_mark)
-                try:
-                    thought = (planning_result or {}).get("thought") or ""
-                    thought = str(thought).strip()
-                    if thought:
-                        from infrastructure.storage.file_service import FileService
-
-                        task_result_path = os.path.join(self.log_service.log_dir, "task_results.json")
-                        existing = FileService.read_json(task_result_path) or {}
-                        if not isinstance(existing, dict):
-                            existing = {}
-                        existing["test_status_report"] = thought
-                        existing.pop("status_reason", None)
-                        existing.pop("status_reason_zh", None)
-                        FileService.write_json(task_result_path, existing, ensure_ascii=False, indent=4)
-                except Exception:
-                    pass
-                if self.enable_task_judge:
-                    self._run_task_judge(local_image_dir, step + 1)
-                self._update_infopool_data()
-                self._save_final_results(start_time, instruction, step_limit=0.0)
-                break
-            
-            # 获取当前要执行的步骤文本
-            current_step_text = self._extract_first_step(plan)
-            
-            # 执行阶段
-            print("\n ---INFO-Operator Agent---\n")
-            execution_result = self.execution_chain.run(
-                local_image_dir,
-                self.coor_type,
-                is_first_step=(step == 0)
+            ctx.planning_result = planning_result
+            if planning_result.get("_speculative_hit"):
+                print("Reusing speculative plan submitted during reflection.")
+            elif planning_result.get("_plan_cache_hit"):
+                print("Reusing cached plan for identical screen and progress.")
+                self._discard_speculative_plan(speculative)
+            else:
+                self._discard_speculative_plan(speculative)
+            self._accumulate_tokens("planner", planning_result.get("_raw_response"))
+
+            # 保存规划结果
+            self.log_service.save_step_message(
+                step + 1,
+                "planner",
+                None,  # messages将在后续版本中保存
+                planning_result.get('thought', '') + "\n" + planning_result.get('plan', '')
             )
-            self._accumulate_tokens("operator", execution_result.get("_raw_response"))
-            
-            action_object = execution_result.get('action_object')
-            if not action_object:
-                continue
-            
-            # 保存执行结果
-            operator_response = f'''### Thought ###
+            self.log_service.append_chat_log("planner", planning_result.get('plan', ''), step + 1)
+
+            print('New completed subgoal (from Planner): ' + planning_result.get('completed_subgoal', ''))
+            print('Completed subgoal summary (used by Planner): ' + (
+                self.state_manager.get_state().planning.completed_plan_summary
+                if self.state_manager.get_state().planning.has_completed_plan_summary
+                else "No completed subgoal summary."
+            ))
+            print('Planning thought: ' + planning_result.get('thought', ''))
+            print('Plan: ' + planning_result.get('plan', ''), "\n")
+
+            # self._update_script_data(step, self._last_command_str)
+            self._last_command_str = None
+        else:
+            self._discard_speculative_plan(speculative)
+
+        # 检查是否完成
+        plan = self.state_manager.get_plan()
+        if "Finished" in plan.strip() and len(plan.strip()) < 15:
+            return Phase.JUDGING
+
+        # 获取当前要执行的步骤文本
+        ctx.current_step_text = self._extract_first_step(plan)
+        return Phase.EXECUTING
+
+    def _finish_step(self, ctx: "_RunContext") -> Phase:
+        """JUDGING：计划已完成，记录测试报告并运行TaskJudge"""
+        step = ctx.step
+        print("Instruction finished, evaluating task result...")
+        self._update_script_data(step, self._last_command_str, self._last_som_mark)
+        try:
+            thought = (ctx.planning_result or {}).get("thought") or ""
+            thought = str(thought).strip()
+            if thought:
+                from infrastructure.storage.file_service import FileService
+
+                task_result_path = os.path.join(self.log_service.log_dir, "task_results.json")
+                existing = FileService.read_json(task_result_path) or {}
+                if not isinstance(existing, dict):
+                    existing = {}
+                existing["test_status_report"] = thought
+                existing.pop("status_reason", None)
+                existing.pop("status_reason_zh", None)
+                FileService.write_json(task_result_path, existing, ensure_ascii=False, indent=4)
+        except Exception:
+            pass
+        if self.enable_task_judge:
+            self._run_task_judge(ctx.before_image, step + 1)
+        self._update_infopool_data()
+        self._save_final_results(ctx.start_time, ctx.instruction, step_limit=0.0)
+        return Phase.DONE
+
+    def _execute_step(self, ctx: "_RunContext") -> Phase:
+        """EXECUTING：运行Operator并在设备上执行动作"""
+        step = ctx.step
+        print("\n ---INFO-Operator Agent---\n")
+        execution_result = self.execution_chain.run(
+            ctx.before_image,
+            self.coor_type,
+            is_first_step=(step == 0)
+        )
+        self._accumulate_tokens("operator", execution_result.get("_raw_response"))
+
+        action_object = execution_result.get('action_object')
+        if not action_object:
+            return self._next_step(ctx)
+        ctx.execution_result = execution_result
+
+        # 保存执行结果
+        operator_response = f'''### Thought ###
 {execution_result.get('thought', '')}
 
 ### Action ###
@@ -275,43 +441,59 @@ class TaskOrchestrator:
 
 ### Description ###
 {execution_result.get('description', '')}'''
-            self.log_service.save_step_message(
-                step + 1,
-                "operator",
-                None,
-                operator_response
+        self.log_service.save_step_message(
+            step + 1,
+            "operator",
+            None,
+            operator_response
+        )
+        self.log_service.append_chat_log("operator", operator_response, step + 1)
+
+        print('Thought: ' + execution_result.get('thought', ''))
+        print('Action: ' + json.dumps(action_object, ensure_ascii=False))
+        print('Action description: ' + execution_result.get('description', ''))
+
+        # 处理answer动作
+        if action_object.get('action') == ANSWER:
+            answer_content = action_object.get('text', '')
+            print(f"Instruction finished, answer: {answer_content}")
+
+            # 将answer操作加入历史
+            self.state_manager.set_last_action(action_object, execution_result.get('description', ''))
+            self.state_manager.append_action(
+                action_object,
+                execution_result.get('description', ''),
+                "S",
+                "None"
             )
-            self.log_service.append_chat_log("operator", operator_response, step + 1)
-            
-            print('Thought: ' + execution_result.get('thought', ''))
-            print('Action: ' + json.dumps(action_object, ensure_ascii=False))
-            print('Action description: ' + execution_result.get('description', ''))
-            
-            # 处理answer动作
-            if action_object.get('action') == ANSWER:
-                answer_content = action_object.get('text', '')
-                print(f"Instruction finished, answer: {answer_content}")
-                
-                # 将answer操作加入历史
-                self.state_manager.set_last_action(action_object, execution_result.get('description', ''))
-                self.state_manager.append_action(
-                    action_object,
-                    execution_result.get('description', ''),
-                    "S",
-                    "None"
-                )
-                # 修改：Answer后不直接退出，而是继续流程（拍照->反思->下一轮规划）
-                # 为了兼容反思Agent，我们需要“假装”拍了一张新照片（或者直接复用旧照片）
-                # 这里我们选择继续执行后续的 take_screenshot 逻辑，虽然屏幕可能没变
-            
-            # 获取操作后的截图
-            local_image_dir2 = self.screenshot_service.take_screenshot()
-            if not local_image_dir2:
-                self._save_final_results(start_time, instruction, step_limit=1.0)
-                self.device_controller.home()
-                return self.log_service.log_dir
-            
-            # 反思阶段
+            # 修改：Answer后不直接退出，而是继续流程（拍照->反思->下一轮规划）
+            # answer不会改变屏幕：默认复用旧照片并跳过反思，直接以"S"进入下一轮规划
+            if self.skip_reflection_on_answer:
+                ctx.after_image = ctx.before_image
+                return Phase.REFLECTING
+        return Phase.CAPTURING
+
+    def _capture_step(self, ctx: "_RunContext") -> Phase:
+        """CAPTURING：获取操作后的截图，并按需提前提交下一步的规划请求"""
+        ctx.after_image = self.screenshot_service.take_screenshot()
+        if not ctx.after_image:
+            return Phase.ABORTED
+        if self._speculation_pool is not None and ctx.step + 1 < ctx.max_step:
+            ctx.speculative_plan = self.planning_chain.speculate(ctx.after_image, self._speculation_pool)
+        return Phase.REFLECTING
+
+    def _reflect_step(self, ctx: "_RunContext") -> Phase:
+        """REFLECTING：运行Reflector并更新script/infopool数据"""
+        step = ctx.step
+        local_image_dir = ctx.before_image
+        local_image_dir2 = ctx.after_image
+        execution_result = ctx.execution_result
+
+        # 反思阶段
+        if self.skip_reflection_on_answer and execution_result['action_object'].get('action') == ANSWER:
+            print("\n---INFO-ActionReflector Agent (skipped for answer action)---\n")
+            reflection_result = self.reflection_chain.skip()
+        else:
             print("\n---INFO-ActionReflector Agent---\n")
             reflection_result = self.reflection_chain.run(
                 local_image_dir,
@@ -319,94 +501,54 @@ class TaskOrchestrator:
                 step,
                 self.enable_notetaker
             )
-            self._accumulate_tokens("reflector", reflection_result.get("_reflector_raw_response"))
-            self._accumulate_tokens("path_summarizer", reflection_result.get("_path_summarizer_raw_response"))
-            self._accumulate_tokens("recorder", reflection_result.get("_recorder_raw_response"))
-            
-            # 保存反思结果
-            tree_similarity = reflection_result.get("tree_similarity")
-            tree_similarity_text = f"{tree_similarity:.4f}" if isinstance(tree_similarity, (int, float)) else "None"
-            self.log_service.save_step_message(
-                step + 1,
-                "reflector",
-                None,
-                "LLM Outcome: "
-                + str(reflection_result.get("llm_outcome", ""))
-                + "\nTree Similarity: "
-                + tree_similarity_text
-                + "\nFinal Outcome: "
-                + str(reflection_result.get("final_outcome", ""))
-                + "\nError Description: "
-                + str(reflection_result.get("error_description", "")),
-                extra={
-                    "llm_outcome": reflection_result.get("llm_outcome"),
-                    "tree_similarity": reflection_result.get("tree_similarity"),
-                    "tree_confirmed": reflection_result.get("tree_confirmed"),
-                    "tree_before_xml": reflection_result.get("tree_before_xml"),
-                    "tree_after_xml": reflection_result.get("tree_after_xml"),
-                    "final_outcome": reflection_result.get("final_outcome"),
-                }
-            )
-            action_outcome = reflection_result.get('action_outcome', '')
-            self.log_service.append_chat_log("action_reflector", action_outcome, step + 1)
-            print('Action reflection outcome: ' + action_outcome)
-            print('Action reflection error description: ' + reflection_result.get('error_description', ''))
-            print('Action reflection progress status: ' + self.state_manager.get_progress_status(), "\n")
-            
-            # 更新执行历史
-            if current_step_text:
-                status = "Success" if action_outcome == 'S' else "Fail"
-                self.execution_history.append(f"{current_step_text} ({status})")
-            
-            self.state_manager.set_prev_action_images(local_image_dir, local_image_dir2)
-            self._last_command_str = execution_result.get('command_str')
-            self._last_som_mark = execution_result.get('som_mark')
-            
-            # 更新数据
-            self._update_script_data(step, self._last_command_str, self._last_som_mark)
-            self._update_infopool_data()
-        
-        # 检查是否达到最大步数
-        if not os.path.exists(os.path.join(self.log_service.log_dir, "task_results.json")):
-            self._save_final_results(start_time, instruction, step_limit=1.0)
+        self._accumulate_tokens("reflector", reflection_result.get("_reflector_raw_response"))
+        self._accumulate_tokens("path_summarizer", reflection_result.get("_path_summarizer_raw_response"))
+        self._accumulate_tokens("recorder", reflection_result.get("_recorder_raw_response"))
         
-        # 补录最后一步的subgoal
-        # 如果当前循环结束时，还有一个current_subgoal正在进行中（即Operator执行了动作但Planner还没来得及确认完成）
-        # 我们通常认为这个动作是为了完成当前的current_subgoal
-        # 注意：这里我们使用 state_manager.get_current_subgoal() 而不是 completed_subgoal
-        state = self.state_manager.get_state()
-        current_subgoal = state.planning.current_subgoal
-        if current_subgoal and self._last_command_str:
-             # 获取最后一次操作的截图
-            image_before, image_after = self.state_manager.get_prev_action_images()
-            if not image_before: image_before = ""
-            if not image_after: image_after = ""
-            
-            # Build info dict with mode metadata
-            info_dict = {
-                "opter": self._last_command_str,
-                "picture": [
-                    {"last": image_before, "next": image_after}
-                ]
+        # 保存反思结果
+        tree_similarity = reflection_result.get("tree_similarity")
+        tree_similarity_text = f"{tree_similarity:.4f}" if isinstance(tree_similarity, (int, float)) else "None"
+        self.log_service.save_step_message(
+            step + 1,
+            "reflector",
+            None,
+            "LLM Outcome: "
+            + str(reflection_result.get("llm_outcome", ""))
+            + "\nTree Similarity: "
+            + tree_similarity_text
+            + "\nFinal Outcome: "
+            + str(reflection_result.get("final_outcome", ""))
+            + "\nError Description: "
+            + str(reflection_result.get("error_description", "")),
+            extra={
+                "llm_outcome": reflection_result.get("llm_outcome"),
+                "tree_similarity": reflection_result.get("tree_similarity"),
+                "tree_confirmed": reflection_result.get("tree_confirmed"),
+                "tree_before_xml": reflection_result.get("tree_before_xml"),
+                "tree_after_xml": reflection_result.get("tree_after_xml"),
+                "final_outcome": reflection_result.get("final_outcome"),
             }
-            
-            # Add SoM metadata if applicable
-            if self.perception_mode == "som":
-                info_dict["mode"] = "som"
-                if self._last_som_mark:
-                    info_dict["mark"] = self._last_som_mark
-            
-            self.script_data["subgoals"].append({
-                "subgoal": current_subgoal,
-                "info": info_dict
-            })
-
-        # 保存最终数据
-        self._save_script_and_infopool()
-        self.device_controller.home()
+        )
+        action_outcome = reflection_result.get('action_outcome', '')
+        self.log_service.append_chat_log("action_reflector", action_outcome, step + 1)
+        print('Action reflection outcome: ' + action_outcome)
+        print('Action reflection error description: ' + reflection_result.get('error_description', ''))
+        print('Action reflection progress status: ' + self.state_manager.get_progress_status(), "\n")
         
-        return self.log_service.log_dir
-    
+        # 更新执行历史
+        if ctx.current_step_text:
+            status = "Success" if action_outcome == 'S' else "Fail"
+            self.execution_history.append(f"{ctx.current_step_text} ({status})")
+        
+        self.state_manager.set_prev_action_images(local_image_dir, local_image_dir2)
+        self._last_command_str = execution_result.get('command_str')
+        self._last_som_mark = execution_result.get('som_mark')
+        
+        # 更新数据
+        self._update_script_data(step, self._last_command_str, self._last_som_mark)
+        self._update_infopool_data()
+        return self._next_step(ctx)
+
     def _run_task_judge(self, screenshot_path: str, step: int) -> None:
         """运行TaskJudge"""
         print("\n---INFO-Judger Agent---\n")
@@ -547,8 +689,8 @@ class TaskOrchestrator:
             test_status_report = test_status_report or "Finished within step limit"
         
         execution_steps = self._count_exploration_steps()
-        token_usage = self.token_usage_by_role
-        total_tokens = sum(v.get("total_tokens", 0) for v in (token_usage or {}).values())
+        token_usage = dict(self.token_usage_by_role)
+        total_tokens = sum(v.get("total_tokens", 0) for v in token_usage.values())
         
         self.report_service.save_task_results(
             self.log_service.log_dir,
@@ -595,66 +737,41 @@ class TaskOrchestrator:
     def _extract_token_usage(self, raw_response: Any) -> Optional[Dict[str, int]]:
         if raw_response is None:
             return None
-        
-        usage_obj = getattr(raw_response, "usage", None)
-        if usage_obj:
-            if isinstance(usage_obj, dict):
-                prompt_tokens = usage_obj.get("prompt_tokens") or usage_obj.get("input_tokens")
-                completion_tokens = usage_obj.get("completion_tokens") or usage_obj.get("output_tokens")
-                total_tokens = usage_obj.get("total_tokens")
+
+        for attr, nested_keys in _TOKEN_SOURCES:
+            usage = getattr(raw_response, attr, None)
+            if nested_keys is None:
+                if not usage:
+                    continue
             else:
-                prompt_tokens = getattr(usage_obj, "prompt_tokens", None) or getattr(usage_obj, "input_tokens", None)
-                completion_tokens = getattr(usage_obj, "completion_tokens", None) or getattr(usage_obj, "output_tokens", None)
-                total_tokens = getattr(usage_obj, "total_tokens", None)
-            
-            prompt_tokens = int(prompt_tokens or 0)
-            completion_tokens = int(completion_tokens or 0)
-            total_tokens = int(total_tokens or (prompt_tokens + completion_tokens))
-            return {
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": total_tokens
-            }
-        
-        usage_md = getattr(raw_response, "usage_metadata", None)
-        if isinstance(usage_md, dict):
-            prompt_tokens = int(usage_md.get("input_tokens") or usage_md.get("prompt_tokens") or 0)
-            completion_tokens = int(usage_md.get("output_tokens") or usage_md.get("completion_tokens") or 0)
-            total_tokens = int(usage_md.get("total_tokens") or (prompt_tokens + completion_tokens))
+                if not isinstance(usage, dict):
+                    continue
+                if nested_keys:
+                    usage = _first_token_value(usage, nested_keys)
+                    if not isinstance(usage, dict):
+                        continue
+            prompt_tokens = int(_first_token_value(usage, _TOKEN_KEY_ALIASES["prompt"]) or 0)
+            completion_tokens = int(_first_token_value(usage, _TOKEN_KEY_ALIASES["completion"]) or 0)
+            total_tokens = int(
+                _first_token_value(usage, _TOKEN_KEY_ALIASES["total"]) or (prompt_tokens + completion_tokens)
+            )
             return {
                 "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
                 "total_tokens": total_tokens
             }
-        
-        resp_md = getattr(raw_response, "response_metadata", None)
-        if isinstance(resp_md, dict):
-            token_usage = resp_md.get("token_usage") or resp_md.get("usage")
-            if isinstance(token_usage, dict):
-                prompt_tokens = int(token_usage.get("prompt_tokens") or token_usage.get("input_tokens") or 0)
-                completion_tokens = int(token_usage.get("completion_tokens") or token_usage.get("output_tokens") or 0)
-                total_tokens = int(token_usage.get("total_tokens") or (prompt_tokens + completion_tokens))
-                return {
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": total_tokens
-                }
-        
         return None
 
     def _accumulate_tokens(self, role: str, raw_response: Any) -> None:
         usage = self._extract_token_usage(raw_response)
         if not usage:
             return
-        current = self.token_usage_by_role.get(role) or {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0
-        }
-        current["prompt_tokens"] += int(usage.get("prompt_tokens", 0))
-        current["completion_tokens"] += int(usage.get("completion_tokens", 0))
-        current["total_tokens"] += int(usage.get("total_tokens", 0))
-        self.token_usage_by_role[role] = current
+        # 被丢弃的预先规划会在线程池回调中计数，需加锁
+        with self._token_lock:
+            current = self.token_usage_by_role[role]
+            current["prompt_tokens"] += int(usage.get("prompt_tokens", 0))
+            current["completion_tokens"] += int(usage.get("completion_tokens", 0))
+            current["total_tokens"] += int(usage.get("total_tokens", 0))
     
     def _extract_first_step(self, plan: str) -> str:
         """从计划中提取第一步的文本描述（移除编号）"""
@@ -684,16 +801,23 @@ class TaskOrchestrator:
         # 移除标点符号和空白
         return re.sub(r'[\s\.\,，。、]+', '', text.lower())
 
+    def _total_plan(self) -> str:
+        """已完成计划 + 剩余计划（去掉answer步骤），计划文本未变化时复用上次结果"""
+        planning = self.state_manager.get_state().planning
+        completed_plan = planning.completed_plan if planning.has_completed_plan else ""
+        plan = planning.plan
+        cached_completed, cached_plan, cached_result = self._total_plan_cache
+        if completed_plan == cached_completed and plan == cached_plan:
+            return cached_result
+        combined_plan = completed_plan + "\n" + plan if completed_plan else plan
+        result = _strip_answer_step(combined_plan)
+        self._total_plan_cache = (completed_plan, plan, result)
+        return result
+
     def _update_script_data(self, step: int, command_str: Optional[str], som_mark: Optional[str] = None) -> None:
         """更新script数据"""
         # 使用与infopool.json一致的逻辑：已完成计划 + 剩余计划
-        state = self.state_manager.get_state()
-        combined_plan = state.planning.plan
-        if state.planning.completed_plan not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-            combined_plan = state.planning.completed_plan + "\n" + state.planning.plan
-        combined_plan = _strip_answer_step(combined_plan)
-        
-        self.script_data["total_plan"] = combined_plan
+        self.script_data["total_plan"] = self._total_plan()
         
         # 修正逻辑：使用 current_subgoal 而非 completed_subgoal
         # 我们记录的是：当前这一步的动作(command_str)是为了完成哪个目标(current_subgoal)
@@ -701,46 +825,31 @@ class TaskOrchestrator:
         
         # 只有当存在有效动作和当前目标时才记录
         if current_subgoal and command_str:
-            image_before, image_after = self.state_manager.get_prev_action_images()
-            if not image_before:
-                image_before = ""
-            if not image_after:
-                image_after = ""
-            
-            # Build info dict with mode metadata
-            info_dict = {
-                "opter": command_str,
-                "picture": [
-                    {"last": image_before, "next": image_after}
-                ]
-            }
-            
-            # Add SoM metadata if applicable
-            if self.perception_mode == "som":
-                info_dict["mode"] = "som"
-                if som_mark:
-                    info_dict["mark"] = som_mark
-            
-            self.script_data["subgoals"].append({
-                "subgoal": current_subgoal,
-                "info": info_dict
-            })
+            self._append_script_subgoal(current_subgoal, command_str, som_mark)
+    
+    def _append_script_subgoal(self, subgoal: str, command_str: str, som_mark: Optional[str]) -> None:
+        """记录一条子目标及其对应的操作和前后截图"""
+        image_before, image_after = self.state_manager.get_prev_action_images()
+        self.script_data["subgoals"].append(SubgoalRecord(
+            subgoal,
+            command_str,
+            image_before or "",
+            image_after or "",
+            self._script_mode,
+            (som_mark or "") if self._script_mode else ""
+        ))
     
     def _update_infopool_data(self) -> None:
         """更新infopool数据"""
         state = self.state_manager.get_state()
         self.infopool_data["plans"].append(state.planning.plan)
-        
-        combined_plan = state.planning.plan
-        if state.planning.completed_plan not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-            combined_plan = state.planning.completed_plan + "\n" + state.planning.plan
-        combined_plan = _strip_answer_step(combined_plan)
-        self.infopool_data["total_plan"] = combined_plan
+        completed_plan = state.planning.completed_plan
+        self.infopool_data["total_plan"] = self._total_plan()
         
         self.infopool_data["progress"].append(state.reflection.progress_status)
-        if state.planning.completed_plan and state.planning.completed_plan not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-            self.infopool_data["completed_subgoals"].append(state.planning.completed_plan)
-        if state.planning.completed_plan_summary and state.planning.completed_plan_summary not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
+        if state.planning.has_completed_plan:
+            self.infopool_data["completed_subgoals"].append(completed_plan)
+        if state.planning.has_completed_plan_summary:
             self.infopool_data["completed_subgoals_summary"].append(state.planning.completed_plan_summary)
     
     def _save_script_and_infopool(self) -> None:
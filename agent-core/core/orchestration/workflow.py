@@ -0,0 +1,75 @@
+"""工作流图：将编排循环显式建模为状态机（PLANNING → EXECUTING → CAPTURING → REFLECTING → DONE）"""
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+
+class Phase(str, Enum):
+    """编排阶段"""
+    PLANNING = "planning"
+    EXECUTING = "executing"
+    CAPTURING = "capturing"
+    REFLECTING = "reflecting"
+    JUDGING = "judging"
+    DONE = "done"
+    ABORTED = "aborted"
+
+
+TERMINAL_PHASES = (Phase.DONE, Phase.ABORTED)
+
+
+@dataclass
+class WorkflowNode:
+    """工作流节点：处理函数接收上下文并返回下一阶段"""
+    phase: Phase
+    handler: Callable[[Any], Phase]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
+
+class WorkflowGraph:
+    """工作流图：按阶段转移驱动各节点"""
+
+    def __init__(self):
+        self._nodes: Dict[Phase, WorkflowNode] = {}
+
+    def add_node(
+        self,
+        phase: Phase,
+        handler: Callable[[Any], Phase],
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = ()
+    ) -> None:
+        """注册节点
+
+        Args:
+            phase: 节点对应的阶段
+            handler: 处理函数，返回下一阶段
+            inputs: 节点依赖的上下文字段
+            outputs: 节点写入的上下文字段
+        """
+        self._nodes[phase] = WorkflowNode(phase, handler, tuple(inputs), tuple(outputs))
+
+    def is_ready(self, phase: Phase, ctx: Any) -> bool:
+        """检查节点的输入是否均已就绪"""
+        node = self._nodes.get(phase)
+        if node is None:
+            return False
+        return all(getattr(ctx, name, None) is not None for name in node.inputs)
+
+    def run(self, ctx: Any, start: Phase = Phase.PLANNING) -> Phase:
+        """从start阶段开始驱动状态机，直到进入终止阶段
+
+        Returns:
+            终止阶段（DONE 或 ABORTED）
+        """
+        phase = start
+        while phase not in TERMINAL_PHASES:
+            node = self._nodes.get(phase)
+            if node is None:
+                raise ValueError(f"No handler registered for phase: {phase.value}")
+            if not self.is_ready(phase, ctx):
+                missing = [name for name in node.inputs if getattr(ctx, name, None) is None]
+                raise RuntimeError(f"Phase {phase.value} is missing inputs: {', '.join(missing)}")
+            phase = node.handler(ctx)
+        return phase
@@ -1,23 +1,103 @@
 """状态管理器：管理所有状态，提供更新、查询、持久化接口"""
+import os
+import hashlib
+from collections import deque
+from itertools import islice
+from dataclasses import fields, is_dataclass
 from typing import Optional, Dict, Any
 import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from .state_schema import MobileAgentState, TaskState, PlanningState, ExecutionState, ReflectionState
 from infrastructure.storage.file_service import FileService
 
 
+# 表示“无已完成子目标”的占位文本（兼容中英文）
+NO_COMPLETED_SUBGOAL_SENTINELS = frozenset({"无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"})
+# 计入错误阈值的动作结果
+_BAD_OUTCOMES = frozenset({"B", "C", "N"})
+
+
+def _trailing_bad_count(outcomes) -> int:
+    """统计序列末尾连续的失败结果数"""
+    count = 0
+    for outcome in reversed(outcomes):
+        if outcome not in _BAD_OUTCOMES:
+            break
+        count += 1
+    return count
+
+
+def recent_items(seq, num: int) -> list:
+    """返回序列末尾的num个元素（兼容list与限长deque）"""
+    if isinstance(seq, list):
+        return seq[-num:]
+    return list(islice(reversed(seq), num))[::-1]
+
+
+def _orjson_default(obj: Any) -> Any:
+    """orjson编码回调：状态dataclass按字段浅层展开，限长deque转为list"""
+    if isinstance(obj, deque):
+        return list(obj)
+    if is_dataclass(obj):
+        data = {f.name: getattr(obj, f.name) for f in fields(obj) if f.init}
+        if isinstance(obj, PlanningState):
+            data["completed_plan"] = obj.completed_plan
+            data["completed_plan_summary"] = obj.completed_plan_summary
+        return data
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _is_real_completed(text: str) -> bool:
+    """文本是否为真实的已完成子目标（非空且非占位文本）"""
+    return bool(text) and text not in NO_COMPLETED_SUBGOAL_SENTINELS
+
+
 class StateManager:
     """状态管理器类"""
     
-    def __init__(self, initial_state: Optional[MobileAgentState] = None):
+    def __init__(
+        self,
+        initial_state: Optional[MobileAgentState] = None,
+        history_cap: Optional[int] = None,
+        record_progress_history: bool = False
+    ):
         """初始化状态管理器
         
         Args:
             initial_state: 初始状态，如果为None则创建新状态
+            history_cap: 动作/进度历史保留的最大条数，None表示不限制
+                （TaskJudge会读取完整的执行历史，限制后只能看到最近的记录）
+            record_progress_history: 是否记录每次的进度状态（progress_status_history），
+                流程中不读取该历史（infopool已按步骤记录进度），默认不记录
         """
         if initial_state is None:
             self.state = MobileAgentState()
         else:
             self.state = initial_state
+            # 旧版本保存的状态不含缓存标记，按文本重新计算
+            planning = self.state.planning
+            planning.has_completed_plan = _is_real_completed(planning.completed_plan)
+            planning.has_completed_plan_summary = _is_real_completed(planning.completed_plan_summary)
+        
+        if history_cap:
+            execution = self.state.execution
+            execution.action_history = deque(execution.action_history, maxlen=history_cap)
+            execution.summary_history = deque(execution.summary_history, maxlen=history_cap)
+            execution.action_outcomes = deque(execution.action_outcomes, maxlen=history_cap)
+            execution.error_descriptions = deque(execution.error_descriptions, maxlen=history_cap)
+            reflection = self.state.reflection
+            reflection.progress_status_history = deque(reflection.progress_status_history, maxlen=history_cap)
+        
+        self.record_progress_history = bool(record_progress_history)
+        
+        # 末尾连续失败的动作数，由append_action维护，错误阈值检查无需回看历史
+        self._bad_streak = _trailing_bad_count(self.state.execution.action_outcomes)
+        
+        # 各文件最近一次写入内容的摘要，内容未变化时跳过写入
+        self._last_write_hash: Dict[str, bytes] = {}
     
     # ========== 任务状态相关方法 ==========
     
@@ -65,21 +145,24 @@ class StateManager:
     def append_completed_subgoal(self, subgoal: str) -> None:
         """追加已完成的子目标"""
         # Support both English and Chinese for backward compatibility
-        if subgoal and subgoal not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-            # Check both English and Chinese for backward compatibility
-            if self.state.planning.completed_plan and self.state.planning.completed_plan not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-                self.state.planning.completed_plan = self.state.planning.completed_plan + " " + subgoal
+        if _is_real_completed(subgoal):
+            planning = self.state.planning
+            if planning.has_completed_plan:
+                planning.completed_plan_parts.append(subgoal)
             else:
-                self.state.planning.completed_plan = subgoal
+                planning.completed_plan_parts = [subgoal]
+            planning.has_completed_plan = True
             
-            if self.state.planning.completed_plan_summary and self.state.planning.completed_plan_summary not in ["无已完成子目标。", "No completed subgoal.", "无已完成子目标", "No completed subgoal"]:
-                self.state.planning.completed_plan_summary = self.state.planning.completed_plan_summary + " " + subgoal
+            if planning.has_completed_plan_summary:
+                planning.completed_plan_summary_parts.append(subgoal)
             else:
-                self.state.planning.completed_plan_summary = subgoal
+                planning.completed_plan_summary_parts = [subgoal]
+            planning.has_completed_plan_summary = True
     
     def set_completed_plan_summary(self, summary: str) -> None:
         """设置已完成计划的摘要（覆盖而非追加）"""
         self.state.planning.completed_plan_summary = summary
+        self.state.planning.has_completed_plan_summary = _is_real_completed(summary)
     
     def set_current_subgoal(self, subgoal: str) -> None:
         """设置当前子目标"""
@@ -121,11 +204,8 @@ class StateManager:
         if threshold is None:
             threshold = self.state.planning.err_to_planner_thresh
         
-        if len(self.state.execution.action_outcomes) >= threshold:
-            latest_outcomes = self.state.execution.action_outcomes[-threshold:]
-            count = sum(1 for outcome in latest_outcomes if outcome in ["B", "C", "N"])
-            return count == threshold
-        return False
+        # 最近threshold个结果均为失败，等价于末尾连续失败数不少于threshold
+        return self._bad_streak >= threshold
     
     # ========== 执行状态相关方法 ==========
     
@@ -142,6 +222,7 @@ class StateManager:
         self.state.execution.summary_history.append(summary)
         self.state.execution.action_outcomes.append(outcome)
         self.state.execution.error_descriptions.append(error_description)
+        self._bad_streak = self._bad_streak + 1 if outcome in _BAD_OUTCOMES else 0
     
     def set_last_action(self, action: dict, summary: str = "", thought: str = "") -> None:
         """设置最后一次动作"""
@@ -164,10 +245,10 @@ class StateManager:
         Returns:
             最近的动作记录列表，每个元素包含(action, summary, outcome, error_description)
         """
-        actions = self.state.execution.action_history[-num:]
-        summaries = self.state.execution.summary_history[-num:]
-        outcomes = self.state.execution.action_outcomes[-num:]
-        errors = self.state.execution.error_descriptions[-num:]
+        actions = recent_items(self.state.execution.action_history, num)
+        summaries = recent_items(self.state.execution.summary_history, num)
+        outcomes = recent_items(self.state.execution.action_outcomes, num)
+        errors = recent_items(self.state.execution.error_descriptions, num)
         
         return list(zip(actions, summaries, outcomes, errors))
     
@@ -176,7 +257,8 @@ class StateManager:
     def set_progress_status(self, status: str) -> None:
         """设置进度状态"""
         self.state.reflection.progress_status = status
-        self.state.reflection.progress_status_history.append(status)
+        if self.record_progress_history:
+            self.state.reflection.progress_status_history.append(status)
     
     def get_progress_status(self) -> str:
         """获取进度状态"""
@@ -204,8 +286,32 @@ class StateManager:
     
     # ========== 状态持久化方法 ==========
     
+    def _write_state(self, file_path: str, obj: Any, to_dict) -> bool:
+        """写入状态对象：优先由orjson直接编码dataclass，否则回退到to_dict + json；
+        与上次写入该文件的内容相同时跳过写入"""
+        payload = None
+        if orjson is not None:
+            try:
+                payload = orjson.dumps(
+                    obj,
+                    default=_orjson_default,
+                    option=orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+                )
+            except TypeError:
+                payload = None
+        if payload is None:
+            payload = json.dumps(to_dict(), ensure_ascii=False, indent=4).encode("utf-8")
+        
+        digest = hashlib.blake2b(payload, digest_size=8).digest()
+        if self._last_write_hash.get(file_path) == digest and os.path.exists(file_path):
+            return True
+        ok = FileService.write_bytes(file_path, payload)
+        if ok:
+            self._last_write_hash[file_path] = digest
+        return ok
+    
     def save_to_file(self, file_path: str) -> bool:
-        """保存状态到文件
+        """保存状态到文件（与上次写入该文件的内容相同时跳过写入）
         
         Args:
             file_path: 文件路径
@@ -214,8 +320,7 @@ class StateManager:
             是否成功
         """
         try:
-            state_dict = self.state.to_dict()
-            return FileService.write_json(file_path, state_dict)
+            return self._write_state(file_path, self.state, self.state.to_dict)
         except Exception as e:
             print(f"Failed to save state to {file_path}: {e}")
             return False
@@ -249,11 +354,3 @@ class StateManager:
     def get_state_dict(self) -> dict:
         """获取状态字典（用于序列化）"""
         return self.state.to_dict()
-    
-    # ========== 兼容性方法（保持与InfoPool类似的接口）==========
-    
-    def __getattr__(self, name: str):
-        """提供对state属性的直接访问（兼容性）"""
-        if hasattr(self.state, name):
-            return getattr(self.state, name)
-        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
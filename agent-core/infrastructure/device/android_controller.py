@@ -1,9 +1,24 @@
 """Android设备控制器实现"""
 import os
 import time
+import shlex
+import string
 import subprocess
+from typing import Optional
 from urllib.parse import quote
 from .device_controller import DeviceController
+from .persistent_shell import PersistentShell
+from .command_log import log_command, log_output, flush as flush_command_log
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# ASCII字符到 input text 编码的映射（与 quote(safe="-_.~") 一致，空格编码为 %s）
+_INPUT_TEXT_SAFE = frozenset(string.ascii_letters + string.digits + "-_.~")
+_INPUT_TEXT_TABLE = {
+    code: chr(code) if chr(code) in _INPUT_TEXT_SAFE else f"%{code:02X}"
+    for code in range(128)
+}
+_INPUT_TEXT_TABLE[ord(" ")] = "%s"
 
 
 class AndroidController(DeviceController):
@@ -21,89 +36,163 @@ class AndroidController(DeviceController):
         self.device_id = device_id
         self.print_device_cmd = bool(print_device_cmd)
         
-        # 基础命令前缀，包含设备定向
-        self.adb_base = f"{self.adb_path}"
+        # 基础命令参数，包含设备定向
+        self._adb_args = [self.adb_path]
         if self.device_id:
-            self.adb_base += f" -s {self.device_id}"
+            self._adb_args += ["-s", self.device_id]
+        
+        # 持久的 adb shell 会话（首次执行shell命令时启动），避免每条命令都创建进程
+        self._shell = PersistentShell(self._adb_args + ["shell"])
+        # 设备的 input keyevent 是否支持一次传入多个按键码（首次删除时探测）
+        self._has_multi_keyevent: Optional[bool] = None
     
-    def _run_command(self, command: str, emit: bool = False) -> subprocess.CompletedProcess:
-        """执行命令并处理编码问题"""
-        # 如果命令不是以 adb_base 开头，且是 adb 命令，则自动补充
-        if command.startswith("adb "):
-            # 替换原始的 adb 路径为带 -s 的基础路径
-            command = command.replace("adb", self.adb_base, 1)
-        elif command.startswith(self.adb_path) and self.device_id and f" -s {self.device_id}" not in command:
-            # 替换原始的 adb 路径为带 -s 的基础路径
-            command = command.replace(self.adb_path, self.adb_base, 1)
-
+    def close(self) -> None:
+        """关闭持久的 adb shell 会话，并写出排队中的命令日志"""
+        self._shell.close()
+        flush_command_log()
+    
+    def _run(self, args: list, emit: bool = False) -> str:
+        """执行adb命令（参数列表，不经过本地shell）
+        
+        Args:
+            args: adb之后的参数，如 ["shell", "input", "tap", "1", "2"]
+            emit: 是否按print_device_cmd打印命令及输出
+            
+        Returns:
+            用于展示/记录的命令字符串（不含设备定向参数）
+        """
+        self._execute(args, emit)
+        return shlex.join([self.adb_path] + args)
+    
+    def _execute(self, args: list, emit: bool = False) -> subprocess.CompletedProcess:
+        """执行adb命令并返回执行结果（参数含义同_run）"""
         if emit and self.print_device_cmd:
-            print(self._format_cmd_for_print(command))
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            shell=True,
-            encoding='utf-8',
-            errors='ignore'
-        )
+            log_command(self._format_cmd_for_print(args))
+        result = None
+        if args and args[0] == "shell":
+            # 设备端仍由shell解析，参数需按设备端shell转义
+            cmdline = shlex.join(args[1:])
+            try:
+                result = self._shell.exec(cmdline)
+            except OSError:
+                # 持久shell不可用或命令超时（会话已结束）时退回到单独的进程，同样限时
+                result = None
+            timeout = self._shell.timeout
+            argv = self._adb_args + ["shell", cmdline]
+        else:
+            argv = self._adb_args + args
+            timeout = None
+        if result is None:
+            try:
+                result = subprocess.run(
+                    argv,
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    errors='ignore',
+                    timeout=timeout
+                )
+            except subprocess.TimeoutExpired as e:
+                result = subprocess.CompletedProcess(argv, -1, "", f"timed out after {e.timeout}s")
+            except OSError as e:
+                result = subprocess.CompletedProcess(argv, -1, "", str(e))
         if emit and self.print_device_cmd:
-            out = (result.stdout or "").strip()
-            err = (result.stderr or "").strip()
-            if out:
-                print(out)
-            if err:
-                print(err)
+            log_output(result.stdout, result.stderr)
         return result
 
-    def _format_cmd_for_print(self, command: str) -> str:
-        prefix = f"{self.adb_path} shell "
-        if command.startswith(prefix):
-            rest = command[len(prefix):]
-            rest = (rest or "").replace('"', '\\"')
-            return f'[ADB] {self.adb_path} shell "{rest}"'
-        return f"[ADB] {command}"
+    def _format_cmd_for_print(self, args: list) -> str:
+        if args and args[0] == "shell":
+            rest = shlex.join(args[1:]).replace('"', '\\"')
+            return f'[ADB] {shlex.join(self._adb_args)} shell "{rest}"'
+        return f"[ADB] {shlex.join(self._adb_args + args)}"
+
+    def _exec_out(self, *args: str) -> bytes:
+        """通过 adb exec-out 执行设备命令并直接返回二进制输出（失败时返回空字节串）"""
+        cmd = self._adb_args + ["exec-out", *args]
+        if self.print_device_cmd:
+            log_command(f"[ADB] {shlex.join(cmd)}")
+        try:
+            result = subprocess.run(cmd, capture_output=True)
+        except OSError:
+            return b""
+        if result.returncode != 0:
+            return b""
+        return result.stdout or b""
 
     def get_screenshot(self, save_path: str) -> bool:
         """获取屏幕截图和DOM树"""
-        # 获取截图
-        command = self.adb_path + " shell rm /sdcard/screenshot.png"
-        self._run_command(command, emit=True)
-        time.sleep(0.5)
-        command = self.adb_path + " shell screencap -p /sdcard/screenshot.png"
-        self._run_command(command, emit=True)
-        time.sleep(0.5)
-        command = self.adb_path + f" pull /sdcard/screenshot.png \"{save_path}\""
-        self._run_command(command, emit=True)
+        # 获取截图：exec-out直接传回PNG数据，不经过sdcard，也无需等待
+        data = self._exec_out("screencap", "-p")
+        if data.startswith(_PNG_SIGNATURE):
+            with open(save_path, "wb") as f:
+                f.write(data)
+        else:
+            # 不支持exec-out的设备：沿用sdcard中转
+            self._run(["shell", "rm", "/sdcard/screenshot.png"], emit=True)
+            self._run(["shell", "screencap", "-p", "/sdcard/screenshot.png"], emit=True)
+            self._wait_remote_file("/sdcard/screenshot.png")
+            self._run(["pull", "/sdcard/screenshot.png", save_path], emit=True)
 
         # 获取DOM树
         try:
             xml_save_path = os.path.splitext(save_path)[0] + ".xml"
             for _ in range(3):
-                command = self.adb_path + " shell rm /sdcard/window_dump.xml"
-                self._run_command(command, emit=True)
-                command = self.adb_path + " shell uiautomator dump /sdcard/window_dump.xml"
-                self._run_command(command, emit=True)
-                time.sleep(0.5)
-                command = self.adb_path + f" pull /sdcard/window_dump.xml \"{xml_save_path}\""
-                self._run_command(command, emit=True)
-                if os.path.exists(xml_save_path):
+                xml = self._dump_ui_tree()
+                if xml:
+                    with open(xml_save_path, "wb") as f:
+                        f.write(xml)
+                    break
+                # dump会覆盖旧文件；失败时（如界面繁忙）不拉取，避免取到上一次的残留文件
+                result = self._execute(["shell", "uiautomator", "dump", "/sdcard/window_dump.xml"], emit=True)
+                if result.returncode != 0 or "dumped to" not in (result.stdout or ""):
+                    continue
+                self._run(["pull", "/sdcard/window_dump.xml", xml_save_path], emit=True)
+                if os.path.exists(xml_save_path) and os.path.getsize(xml_save_path) > 0:
                     break
         except Exception:
             pass
         
         return os.path.exists(save_path)
+
+    def _wait_remote_file(self, path: str, timeout: float = 1.0) -> bool:
+        """等待设备端文件生成（非空）：从2ms开始指数退避轮询，单次间隔不超过50ms
+        
+        Args:
+            path: 设备端文件路径
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            文件是否已就绪
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.002
+        while True:
+            if self._execute(["shell", "test", "-s", path]).returncode == 0:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def _dump_ui_tree(self) -> bytes:
+        """通过 exec-out 获取DOM树XML（失败时返回空字节串）"""
+        data = self._exec_out("uiautomator", "dump", "/dev/tty")
+        # 输出为XML后紧跟 "UI hierchary dumped to: /dev/tty"
+        end = data.rfind(b">")
+        start = data.find(b"<?xml")
+        if start < 0 or end < start:
+            return b""
+        return data[start:end + 1]
     
     def tap(self, x: int, y: int) -> str:
         """点击坐标"""
-        command = self.adb_path + f" shell input tap {x} {y}"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(["shell", "input", "tap", str(x), str(y)], emit=True)
     
-    def _sh_quote(self, s: str) -> str:
-        return "'" + (s or "").replace("'", "'\\''") + "'"
-
     def _encode_for_input_text(self, s: str) -> str:
-        encoded = quote(s or "", safe="-_.~")
+        s = s or ""
+        if s.isascii():
+            return s.translate(_INPUT_TEXT_TABLE)
+        encoded = quote(s, safe="-_.~")
         return encoded.replace("%20", "%s")
 
     def type(self, text: str) -> str:
@@ -117,42 +206,55 @@ class AndroidController(DeviceController):
             if not seg:
                 return
             encoded = self._encode_for_input_text(seg)
-            command = self.adb_path + f" shell input text {self._sh_quote(encoded)}"
-            self._run_command(command, emit=True)
-            commands.append(command)
+            commands.append(self._run(["shell", "input", "text", encoded], emit=True))
 
-        def send_adbkeyboard_char(ch: str) -> None:
-            command = self.adb_path + f" shell am broadcast -a ADB_INPUT_TEXT --es msg {self._sh_quote(ch)}"
-            self._run_command(command, emit=True)
-            commands.append(command)
+        def send_adbkeyboard_run(run: str) -> None:
+            # ADBKeyboard的msg可接收整段文本，连续的非ASCII字符合并为一次广播
+            if not run:
+                return
+            commands.append(self._run(["shell", "am", "broadcast", "-a", "ADB_INPUT_TEXT", "--es", "msg", run], emit=True))
 
         def send_enter() -> None:
-            command = self.adb_path + " shell input keyevent 66"
-            self._run_command(command, emit=True)
-            commands.append(command)
+            commands.append(self._run(["shell", "input", "keyevent", "66"], emit=True))
 
         for i, line in enumerate(lines):
             buf = ""
+            nbuf = ""
             for ch in line:
                 if ord(ch) < 128:
+                    send_adbkeyboard_run(nbuf)
+                    nbuf = ""
                     buf += ch
                 else:
                     send_input_text_segment(buf)
                     buf = ""
-                    send_adbkeyboard_char(ch)
+                    nbuf += ch
             send_input_text_segment(buf)
+            send_adbkeyboard_run(nbuf)
 
             if i != len(lines) - 1:
                 send_enter()
         return "; ".join(commands)
     
+    def _supports_multi_keyevent(self) -> bool:
+        """探测 input keyevent 是否接受多个按键码（用法说明中为 "<key code ...> ..."）"""
+        if self._has_multi_keyevent is None:
+            usage = self._execute(["shell", "input"])
+            text = (usage.stdout or "") + (usage.stderr or "")
+            self._has_multi_keyevent = any(
+                "keyevent" in line and "..." in line for line in text.splitlines()
+            )
+        return self._has_multi_keyevent
+
     def delete(self, count: int = 1) -> str:
-        """删除文本"""
+        """删除文本（支持时一次命令发送全部退格键）"""
+        if count <= 0:
+            return ""
+        if count > 1 and self._supports_multi_keyevent():
+            return self._run(["shell", "input", "keyevent"] + ["67"] * count, emit=True)
         commands = []
         for _ in range(count):
-            command = self.adb_path + f" shell input keyevent 67"
-            self._run_command(command, emit=True)
-            commands.append(command)
+            commands.append(self._run(["shell", "input", "keyevent", "67"], emit=True))
         return "; ".join(commands)
     
     def slide(self, x1: int, y1: int, x2: int, y2: int, duration: int = 500) -> str:
@@ -163,9 +265,10 @@ class AndroidController(DeviceController):
             x2, y2: 结束坐标
             duration: 滑动持续时间(ms)，默认500ms
         """
-        command = self.adb_path + f" shell input swipe {x1} {y1} {x2} {y2} {duration}"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(
+            ["shell", "input", "swipe", str(x1), str(y1), str(x2), str(y2), str(duration)],
+            emit=True
+        )
     
     def drag(self, x1: int, y1: int, x2: int, y2: int, duration: int = 1000) -> str:
         """拖拽 (input draganddrop)
@@ -175,18 +278,15 @@ class AndroidController(DeviceController):
             x2, y2: 结束坐标
             duration: 拖拽持续时间(ms)，默认1000ms（注：adb input draganddrop 命令本身不接受 duration 参数，此处仅为接口一致性保留参数，实际不使用）
         """
-        command = self.adb_path + f" shell input draganddrop {x1} {y1} {x2} {y2}"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(["shell", "input", "draganddrop", str(x1), str(y1), str(x2), str(y2)], emit=True)
     
     def back(self) -> str:
         """返回键"""
-        command = self.adb_path + f" shell input keyevent 4"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(["shell", "input", "keyevent", "4"], emit=True)
     
     def home(self) -> str:
         """主页键"""
-        command = self.adb_path + f" shell am start -a android.intent.action.MAIN -c android.intent.category.HOME"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(
+            ["shell", "am", "start", "-a", "android.intent.action.MAIN", "-c", "android.intent.category.HOME"],
+            emit=True
+        )
@@ -0,0 +1,78 @@
+"""设备命令日志：命令及其输出先入队，由后台线程写到stderr，不阻塞设备操作"""
+import sys
+import atexit
+import queue
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+
+class _CurrentStderrHandler(logging.StreamHandler):
+    """每条记录写到写出时的sys.stderr
+
+    运行期间sys.stderr会被替换为按次运行的tee（运行结束后关闭），
+    不能在创建handler时固定住某个流对象
+    """
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_queue = queue.SimpleQueue()
+_logger = logging.getLogger("scenagent.device")
+_logger.addHandler(QueueHandler(_queue))
+_logger.setLevel(logging.INFO)
+_logger.propagate = False
+_handler = _CurrentStderrHandler()
+_handler.setFormatter(logging.Formatter("%(message)s"))
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def _ensure_listener() -> None:
+    """按需启动后台写日志线程（flush后再次记录时重新启动）"""
+    global _listener
+    if _listener is not None:
+        return
+    with _lock:
+        if _listener is not None:
+            return
+        listener = QueueListener(_queue, _handler)
+        listener.start()
+        _listener = listener
+
+
+def flush() -> None:
+    """写出已入队的全部记录并停止后台线程
+
+    设备控制器关闭时调用，保证本次运行的命令日志在恢复stdout/stderr之前写完
+    """
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+atexit.register(flush)
+
+
+def log_command(display: str) -> None:
+    """记录一条设备命令"""
+    _ensure_listener()
+    _logger.info(display)
+
+
+def log_output(stdout: Optional[str], stderr: Optional[str]) -> None:
+    """记录设备命令的输出（合并为一条日志）"""
+    lines = [text for text in ((stdout or "").strip(), (stderr or "").strip()) if text]
+    if not lines:
+        return
+    _ensure_listener()
+    _logger.info("\n".join(lines))
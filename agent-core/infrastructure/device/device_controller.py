@@ -86,4 +86,7 @@ class DeviceController(ABC):
             执行的命令字符串
         """
         pass
-
+    
+    def close(self) -> None:
+        """释放设备连接等资源（默认无操作）"""
+        pass
@@ -1,8 +1,30 @@
 """HarmonyOS设备控制器实现"""
 import os
+import re
 import time
+import shlex
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from .device_controller import DeviceController
+from .persistent_shell import PersistentShell
+from .command_log import log_command, log_output, flush as flush_command_log
+
+
+# type() 中需要用按键事件输入的字符（空格、换行被替换成的"_"）及其键码
+_KEY_EVENTS = {' ': "2050", '_': "2054"}
+# 按上述字符切分文本，得到交替的普通字符串与单个按键字符
+_KEY_EVENT_SPLIT = re.compile(r"([ _])")
+# 固定的hdc命令参数，只构建一次
+_UI_INPUT = ["shell", "uitest", "uiInput"]
+_KEY_DELETE = _UI_INPUT + ["keyEvent", "Delete"]
+_KEY_BACK = _UI_INPUT + ["keyEvent", "Back"]
+_KEY_HOME = _UI_INPUT + ["keyEvent", "Home"]
+_REMOTE_SCREENSHOT = "/data/local/tmp/screenshot.png"
+_REMOVE_SCREENSHOT = ["shell", "rm", "-f", _REMOTE_SCREENSHOT]
+_SCREEN_CAP = ["shell", "uitest", "screenCap", "-p", _REMOTE_SCREENSHOT]
+# screenCap失败时返回码可能仍为0，需同时检查输出
+_SCREEN_CAP_FAILURE = re.compile(r"fail|error", re.IGNORECASE)
+_DUMP_LAYOUT = ["shell", "uitest", "dumpLayout"]
 
 
 class HarmonyOSController(DeviceController):
@@ -16,49 +38,111 @@ class HarmonyOSController(DeviceController):
         """
         self.hdc_path = hdc_path
         self.print_device_cmd = bool(print_device_cmd)
+        # 持久的 hdc shell 会话（首次执行shell命令时启动），避免每条命令都创建进程
+        self._shell = PersistentShell([self.hdc_path, "shell"])
+        # 展示/记录用命令字符串的前缀（已按shell转义）
+        self._display_prefix = shlex.quote(self.hdc_path)
+        # 截图时与拉取PNG并行获取DOM树的线程池（首次截图时创建）
+        self._capture_pool: ThreadPoolExecutor = None
+
+    def close(self) -> None:
+        """关闭持久的 hdc shell 会话，并写出排队中的命令日志"""
+        if self._capture_pool is not None:
+            self._capture_pool.shutdown(wait=True)
+            self._capture_pool = None
+        self._shell.close()
+        flush_command_log()
+
+    def _run(self, args: list, emit: bool = False) -> str:
+        """执行hdc命令（参数列表，不经过本地shell）
+        
+        Args:
+            args: hdc之后的参数，如 ["shell", "uitest", "uiInput", "click", "1", "2"]
+            emit: 是否按print_device_cmd打印命令及输出
+            
+        Returns:
+            用于展示/记录的命令字符串
+        """
+        self._execute(args, emit)
+        return f"{self._display_prefix} {shlex.join(args)}"
 
-    def _run_command(self, command: str, emit: bool = False) -> subprocess.CompletedProcess:
+    def _execute(self, args: list, emit: bool = False) -> subprocess.CompletedProcess:
+        """执行hdc命令并返回执行结果（参数含义同_run）"""
         if emit and self.print_device_cmd:
-            print(self._format_cmd_for_print(command))
-        result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            log_command(self._format_cmd_for_print(args))
+        result = None
+        if args and args[0] == "shell":
+            # 设备端仍由shell解析，参数需按设备端shell转义
+            cmdline = shlex.join(args[1:])
+            try:
+                result = self._shell.exec(cmdline)
+            except OSError:
+                # 持久shell不可用或命令超时（会话已结束）时退回到单独的进程，同样限时
+                result = None
+            timeout = self._shell.timeout
+            argv = [self.hdc_path, "shell", cmdline]
+        else:
+            # file recv/send 等需要hdc客户端本身处理的命令
+            argv = [self.hdc_path] + args
+            timeout = None
+        if result is None:
+            try:
+                result = subprocess.run(
+                    argv, capture_output=True, text=True, encoding="utf-8", errors="ignore", timeout=timeout
+                )
+            except subprocess.TimeoutExpired as e:
+                result = subprocess.CompletedProcess(argv, -1, "", f"timed out after {e.timeout}s")
+            except OSError as e:
+                result = subprocess.CompletedProcess(argv, -1, "", str(e))
         if emit and self.print_device_cmd:
-            out = (result.stdout or "").strip()
-            err = (result.stderr or "").strip()
-            if out:
-                print(out)
-            if err:
-                print(err)
+            log_output(result.stdout, result.stderr)
         return result
 
-    def _format_cmd_for_print(self, command: str) -> str:
-        prefix = f"{self.hdc_path} shell "
-        if command.startswith(prefix):
-            rest = command[len(prefix):]
-            rest = (rest or "").replace('"', '\\"')
+    def _format_cmd_for_print(self, args: list) -> str:
+        if args and args[0] == "shell":
+            rest = shlex.join(args[1:]).replace('"', '\\"')
             return f'[HDC] {self.hdc_path} shell "{rest}"'
-        return f"[HDC] {command}"
+        return f"[HDC] {self._display_prefix} {shlex.join(args)}"
     
     def get_screenshot(self, save_path: str) -> bool:
         """获取屏幕截图和DOM树"""
-        # 获取截图
-        command = self.hdc_path + " shell rm /data/local/tmp/screenshot.png"
-        self._run_command(command, emit=True)
-        time.sleep(0.5)
-        command = self.hdc_path + " shell uitest screenCap -p /data/local/tmp/screenshot.png"
-        self._run_command(command, emit=True)
-        time.sleep(0.5)
-        command = self.hdc_path + " file recv /data/local/tmp/screenshot.png \"" + save_path + "\""
-        self._run_command(command, emit=True)
-        time.sleep(0.5)
+        # 获取截图：先删除旧文件，避免screenCap失败时拉取到上一张截图；命令在持久shell中同步完成，无需等待
+        self._execute(_REMOVE_SCREENSHOT, emit=True)
+        result = self._execute(_SCREEN_CAP, emit=True)
+        if result.returncode != 0 or _SCREEN_CAP_FAILURE.search(f"{result.stdout}\n{result.stderr}"):
+            print(f"HarmonyOS screenCap failed: {(result.stdout or result.stderr or '').strip()}")
+            return False
         
-        # 获取DOM树
+        # 拉取PNG（hdc客户端）与获取DOM树（持久shell）互不依赖，并行执行
+        if self._capture_pool is None:
+            self._capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hdc-layout")
+        layout_future = self._capture_pool.submit(
+            self._save_layout, os.path.splitext(save_path)[0] + ".xml"
+        )
+        received = self._recv_file(_REMOTE_SCREENSHOT, save_path)
+        layout_future.result()
+
+        return received
+
+    def _recv_file(self, remote_path: str, local_path: str, max_attempts: int = 5) -> bool:
+        """拉取设备文件，失败时按指数退避（5ms起）重试"""
+        delay = 0.005
+        for attempt in range(max_attempts):
+            result = self._execute(["file", "recv", remote_path, local_path], emit=True)
+            if result.returncode == 0 and os.path.exists(local_path):
+                return True
+            if attempt < max_attempts - 1:
+                time.sleep(delay)
+                delay *= 2
+        return False
+
+    def _save_layout(self, xml_save_path: str) -> None:
+        """获取DOM树并保存为XML"""
         try:
-            xml_save_path = os.path.splitext(save_path)[0] + ".xml"
             # 尝试使用 dumpLayout 命令
             # 注意：HarmonyOS uitest 的具体 dump 命令可能因版本而异，这里假设为 dumpLayout 并捕获输出
             # 如果 uitest 支持导出到文件，应调整命令
-            command = self.hdc_path + " shell uitest dumpLayout"
-            result = self._run_command(command, emit=True)
+            result = self._execute(_DUMP_LAYOUT, emit=True)
             
             if result.returncode == 0 and result.stdout:
                 # 如果输出包含 XML 声明或标签，则认为是 XML 内容
@@ -71,51 +155,36 @@ class HarmonyOSController(DeviceController):
                     pass
         except Exception as e:
             print(f"Failed to get HarmonyOS DOM XML: {e}")
-
-        return os.path.exists(save_path)
     
     def tap(self, x: int, y: int) -> str:
         """点击坐标"""
-        command = self.hdc_path + f" shell uitest uiInput click {x} {y}"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(_UI_INPUT + ["click", str(x), str(y)], emit=True)
     
     def type(self, text: str) -> str:
-        """输入文本"""
+        """输入文本（连续的普通字符合并为一次inputText，空格和换行使用按键事件）"""
         text = text.replace("\\n", "_").replace("\n", "_")
         commands = []
-        for char in text:
-            if char == ' ':
-                command = self.hdc_path + f" shell uitest uiInput keyEvent 2050"
-                self._run_command(command, emit=True)
-                commands.append(command)
-            elif char == '_':
-                command = self.hdc_path + f" shell uitest uiInput keyEvent 2054"
-                self._run_command(command, emit=True)
-                commands.append(command)
-            elif 'a' <= char <= 'z' or 'A' <= char <= 'Z' or char.isdigit():
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 {char}"
-                self._run_command(command, emit=True)
-                commands.append(command)
-            elif char in '-.,!?@\'°/:;()':
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 \"{char}\""
-                self._run_command(command, emit=True)
-                commands.append(command)
+        for segment in _KEY_EVENT_SPLIT.split(text):
+            if not segment:
+                continue
+            key = _KEY_EVENTS.get(segment)
+            if key is None:
+                commands.append(self._run(_UI_INPUT + ["inputText", "1", "1", segment], emit=True))
             else:
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 {char}"
-                self._run_command(command, emit=True)
-                commands.append(command)
+                commands.append(self._run(_UI_INPUT + ["keyEvent", key], emit=True))
         return "; ".join(commands)
     
     def delete(self, count: int = 1) -> str:
-        """删除文本"""
-        commands = []
-        for _ in range(count):
-            # 尝试使用 Delete 键
-            command = self.hdc_path + " shell uitest uiInput keyEvent Delete"
-            self._run_command(command, emit=True)
-            commands.append(command)
-        return "; ".join(commands)
+        """删除文本（多次删除在设备端循环执行，只需一次命令往返）"""
+        if count <= 0:
+            return ""
+        if count == 1:
+            return self._run(_KEY_DELETE, emit=True)
+        loop = (
+            f"i=0; while [ $i -lt {int(count)} ]; do "
+            f"{shlex.join(_KEY_DELETE[1:])}; i=$((i+1)); done"
+        )
+        return self._run(["shell", "sh", "-c", loop], emit=True)
     
     def slide(self, x1: int, y1: int, x2: int, y2: int, duration: int = 500) -> str:
         """滑动
@@ -125,9 +194,10 @@ class HarmonyOSController(DeviceController):
             x2, y2: 结束坐标
             duration: 滑动持续时间(ms)，默认500ms
         """
-        command = self.hdc_path + f" shell uitest uiInput swipe {x1} {y1} {x2} {y2} {duration}"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(
+            _UI_INPUT + ["swipe", str(x1), str(y1), str(x2), str(y2), str(duration)],
+            emit=True
+        )
     
     def drag(self, x1: int, y1: int, x2: int, y2: int, duration: int = 1000) -> str:
         """拖拽 (封装slide，HarmonyOS暂无独立drag命令)
@@ -143,13 +213,9 @@ class HarmonyOSController(DeviceController):
     
     def back(self) -> str:
         """返回键"""
-        command = self.hdc_path + " shell uitest uiInput keyEvent Back"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(_KEY_BACK, emit=True)
     
     def home(self) -> str:
         """主页键"""
-        command = self.hdc_path + " shell uitest uiInput keyEvent Home"
-        self._run_command(command, emit=True)
-        return command
+        return self._run(_KEY_HOME, emit=True)
 
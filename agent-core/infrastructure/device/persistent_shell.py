@@ -0,0 +1,133 @@
+"""持久的设备shell会话（adb shell / hdc shell），避免每条命令都创建进程"""
+import re
+import queue
+import time
+import subprocess
+import threading
+from typing import List, Optional
+
+
+# 持久shell中每条命令结束后输出返回码标记。发送的命令里标记被拆成两段（"__R""C__:"），
+# 设备端回显的命令行不会包含完整标记；只认位于行尾、后跟返回码的标记
+_RC_ECHO = 'echo "__R""C__:$?"'
+_RC_RE = re.compile(r"__RC__:(\d+)$")
+# 单条命令的默认超时（秒）
+DEFAULT_TIMEOUT = 30.0
+
+
+class PersistentShell:
+    """长驻的设备端shell：命令逐行写入stdin，读取输出直到返回码标记"""
+
+    def __init__(self, argv: List[str], timeout: float = DEFAULT_TIMEOUT):
+        """初始化会话（首次执行命令时才启动进程）
+
+        Args:
+            argv: 启动交互式shell的命令，如 ["adb", "-s", "emulator-5554", "shell"]
+            timeout: 单条命令的超时（秒），超时后结束会话进程
+        """
+        self.argv = list(argv)
+        self.timeout = float(timeout)
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        """会话进程是否在运行"""
+        return self._proc is not None and self._proc.poll() is None
+
+    def _open(self) -> None:
+        proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0
+        )
+        lines = queue.Queue()
+        # 后台线程逐行读取输出，exec按截止时间从队列取行，设备端命令卡住时不会一直阻塞
+        threading.Thread(
+            target=self._read_lines, args=(proc.stdout, lines), name="device-shell-reader", daemon=True
+        ).start()
+        self._proc, self._lines = proc, lines
+
+    @staticmethod
+    def _read_lines(stdout, lines: queue.Queue) -> None:
+        try:
+            for line in iter(stdout.readline, b""):
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        lines.put(None)
+
+    def _kill(self) -> None:
+        proc, self._proc, self._lines = self._proc, None, None
+        if proc is not None:
+            proc.kill()
+
+    def exec(self, cmdline: str) -> subprocess.CompletedProcess:
+        """在会话中执行一条设备端命令
+
+        Args:
+            cmdline: 设备端shell命令（不含 adb/hdc shell 前缀）
+
+        Returns:
+            CompletedProcess（stderr已合并到stdout）
+
+        Raises:
+            OSError: 会话不可用（如设备断开）；超时时为TimeoutError，会话已被结束
+        """
+        with self._lock:
+            if not self.started:
+                self._open()
+            proc, lines = self._proc, self._lines
+            deadline = time.monotonic() + self.timeout
+            sent = f"{cmdline} </dev/null; {_RC_ECHO}"
+            try:
+                proc.stdin.write(f"{sent}\n".encode("utf-8"))
+                proc.stdin.flush()
+                output = []
+                while True:
+                    try:
+                        line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        raise TimeoutError(f"device shell command timed out after {self.timeout}s: {cmdline}")
+                    if line is None:
+                        raise BrokenPipeError("device shell session closed")
+                    text = line.decode("utf-8", errors="ignore").rstrip("\r\n")
+                    match = _RC_RE.search(text)
+                    if match is None:
+                        output.append(text)
+                        continue
+                    # 命令输出不以换行结尾时，标记与最后一段输出在同一行
+                    if match.start() > 0:
+                        output.append(text[:match.start()])
+                    returncode = int(match.group(1))
+                    break
+                # 带PTY的会话会回显输入的命令行，不计入命令输出
+                if output and output[0] == sent:
+                    output.pop(0)
+            except OSError:
+                self._kill()
+                raise
+        stdout = "\n".join(output)
+        return subprocess.CompletedProcess(cmdline, returncode, stdout + "\n" if stdout else "", "")
+
+    def close(self) -> None:
+        """退出会话"""
+        with self._lock:
+            proc, self._proc, self._lines = self._proc, None, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.write(b"exit\n")
+            proc.stdin.flush()
+            proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -1,8 +1,14 @@
 """LLM抽象层：提供统一的LLM接口"""
+import importlib
+
 from .llm_provider import LLMProvider
-from .langchain_llm import LangChainLLMProvider
-from .gui_owl_wrapper import GUIOwlWrapperAdapter
-from .llm_factory import LLMFactory
+
+# 具体实现依赖较重（LangChain、openai等），首次访问时才导入（PEP 562）
+_LAZY_EXPORTS = {
+    'LangChainLLMProvider': '.langchain_llm',
+    'GUIOwlWrapperAdapter': '.gui_owl_wrapper',
+    'LLMFactory': '.llm_factory',
+}
 
 __all__ = [
     'LLMProvider',
@@ -11,3 +17,11 @@ __all__ = [
     'LLMFactory',
 ]
 
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,7 +1,6 @@
 """GUIOwlWrapper适配器：将原有GUIOwlWrapper适配为LLMProvider接口"""
 from typing import Any, Optional, List, Union
 import numpy as np
-from .gui_owl_impl import GUIOwlWrapper
 
 from .llm_provider import LLMProvider
 
@@ -26,6 +25,9 @@ class GUIOwlWrapperAdapter(LLMProvider):
             max_retry: 最大重试次数
             temperature: 温度参数
         """
+        # gui_owl_impl 依赖openai/qwen_vl_utils，创建实例时才导入
+        from .gui_owl_impl import GUIOwlWrapper
+
         self.wrapper = GUIOwlWrapper(
             api_key=api_key,
             base_url=base_url,
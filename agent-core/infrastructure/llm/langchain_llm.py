@@ -1,38 +1,154 @@
 """LangChain LLM提供者实现"""
-from typing import Any, Optional, List, Union
+from typing import Any, Iterator, Optional, List, Tuple, Union
+import os
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 from io import BytesIO
 import base64
-
 try:
-    from langchain_openai import ChatOpenAI
-    from langchain_core.messages import HumanMessage, SystemMessage
-    from langchain_core.prompts import ChatPromptTemplate
-    LANGCHAIN_AVAILABLE = True
+    import xxhash
+except ImportError:
+    xxhash = None
+try:
+    import pybase64
 except ImportError:
-    LANGCHAIN_AVAILABLE = False
-    ChatOpenAI = None
+    pybase64 = None
 
 from .llm_provider import LLMProvider
 
+# LangChain导入耗时较长，首次创建提供者时才加载（见_load_langchain）
+ChatOpenAI = None
+HumanMessage = None
+SystemMessage = None
 
-def image_to_base64(image: Union[str, np.ndarray, Image.Image]) -> str:
-    """将图片转换为base64字符串"""
-    if isinstance(image, str):
-        # 如果是路径，读取图片
-        img = Image.open(image)
-    elif isinstance(image, np.ndarray):
-        # 如果是numpy数组，转换为PIL Image
-        img = Image.fromarray(image)
-    elif isinstance(image, Image.Image):
-        img = image
+
+def _load_langchain() -> bool:
+    """按需导入LangChain，返回是否可用"""
+    global ChatOpenAI, HumanMessage, SystemMessage
+    if ChatOpenAI is None:
+        try:
+            from langchain_openai import ChatOpenAI as _ChatOpenAI
+            from langchain_core.messages import HumanMessage as _HumanMessage, SystemMessage as _SystemMessage
+        except ImportError:
+            return False
+        HumanMessage, SystemMessage = _HumanMessage, _SystemMessage
+        ChatOpenAI = _ChatOpenAI
+    return True
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_JPEG_SIGNATURE = b"\xff\xd8\xff"
+# 有损编码时使用的JPEG质量
+JPEG_QUALITY = 85
+# numpy数组的编码缓存：(内容摘要, 形状, 类型, 格式) -> base64
+_ARRAY_B64_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_ARRAY_B64_CACHE_SIZE = 16
+# 多张图片在_encode_pool线程中并行编码，缓存的读写需加锁
+_ARRAY_B64_CACHE_LOCK = threading.Lock()
+
+
+# 每个线程复用一个编码缓冲区，避免每张图片都分配/释放数MB的BytesIO
+_tls = threading.local()
+
+
+def _b64encode(data: Union[bytes, memoryview]) -> str:
+    """base64编码（安装了pybase64时使用其SIMD实现）"""
+    if pybase64 is not None:
+        return pybase64.b64encode(data).decode("ascii")
+    return base64.b64encode(data).decode("ascii")
+
+
+def _encode_buffer() -> BytesIO:
+    """取当前线程的编码缓冲区（已清空）"""
+    buffer = getattr(_tls, "buffer", None)
+    if buffer is None:
+        buffer = _tls.buffer = BytesIO()
     else:
-        raise ValueError(f"Unsupported image type: {type(image)}")
+        buffer.seek(0)
+        buffer.truncate(0)
+    return buffer
+
+
+def _encode_image(img: Image.Image, image_format: str) -> str:
+    buffer = _encode_buffer()
+    if image_format == "jpeg":
+        img.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    else:
+        img.save(buffer, format="PNG")
+    # 直接编码缓冲区视图，不再复制一份bytes；视图须在下次truncate前释放
+    with buffer.getbuffer() as view:
+        return _b64encode(view)
+
+
+@functools.lru_cache(maxsize=4)
+def _path_to_base64(path: str, mtime_ns: int, size: int, image_format: str) -> Tuple[str, str]:
+    """按(路径, 修改时间, 大小, 格式)缓存的文件编码结果
+    
+    文件已是JPEG，或要求png时文件已是PNG，直接编码原始字节，不经过PIL解码再编码
     
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    Returns:
+        (图片格式, base64字符串)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(_JPEG_SIGNATURE):
+        return "jpeg", _b64encode(data)
+    if image_format == "png" and data.startswith(_PNG_SIGNATURE):
+        return "png", _b64encode(data)
+    return image_format, _encode_image(Image.open(BytesIO(data)), image_format)
+
+
+def _array_digest(arr: np.ndarray) -> bytes:
+    data = np.ascontiguousarray(arr).tobytes()
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def image_to_base64(image: Union[str, np.ndarray, Image.Image], image_format: str = "png") -> str:
+    """将图片转换为base64字符串（同一文件或相同内容的数组复用上次的编码结果）
+    
+    Args:
+        image: 图片路径、numpy数组或PIL图片
+        image_format: 编码格式，"png"（无损）或 "jpeg"（有损，体积更小）
+    """
+    return _image_to_base64(image, image_format)[1]
+
+
+def image_to_data_url(image: Union[str, np.ndarray, Image.Image], image_format: str = "png") -> str:
+    """将图片转换为data URL，MIME类型与实际编码格式一致（JPEG文件原样发送）"""
+    actual_format, data = _image_to_base64(image, image_format)
+    return f"data:image/{actual_format};base64,{data}"
+
+
+def _image_to_base64(image: Union[str, np.ndarray, Image.Image], image_format: str) -> Tuple[str, str]:
+    if isinstance(image, str):
+        # 如果是路径，按文件状态缓存
+        st = os.stat(image)
+        return _path_to_base64(image, st.st_mtime_ns, st.st_size, image_format)
+    if isinstance(image, np.ndarray):
+        # 如果是numpy数组，按内容摘要缓存
+        key = (_array_digest(image), image.shape, image.dtype.str, image_format)
+        with _ARRAY_B64_CACHE_LOCK:
+            cached = _ARRAY_B64_CACHE.get(key)
+            if cached is not None:
+                _ARRAY_B64_CACHE.move_to_end(key)
+                return image_format, cached
+        # 编码在锁外进行，不阻塞其他线程
+        cached = _encode_image(Image.fromarray(image), image_format)
+        with _ARRAY_B64_CACHE_LOCK:
+            _ARRAY_B64_CACHE[key] = cached
+            if len(_ARRAY_B64_CACHE) > _ARRAY_B64_CACHE_SIZE:
+                _ARRAY_B64_CACHE.popitem(last=False)
+        return image_format, cached
+    if isinstance(image, Image.Image):
+        return image_format, _encode_image(image, image_format)
+    raise ValueError(f"Unsupported image type: {type(image)}")
 
 
 class LangChainLLMProvider(LLMProvider):
@@ -45,6 +161,9 @@ class LangChainLLMProvider(LLMProvider):
         model_name: str,
         temperature: float = 0.0,
         max_retries: int = 3,
+        image_format: str = "png",
+        response_cache_size: int = 256,
+        stream_responses: bool = False,
     ):
         """初始化LangChain LLM提供者
         
@@ -54,8 +173,12 @@ class LangChainLLMProvider(LLMProvider):
             model_name: 模型名称
             temperature: 温度参数
             max_retries: 最大重试次数
+            image_format: 发送图片的编码格式，"png"（默认，无损）或 "jpeg"（有损，上传体积更小）
+            response_cache_size: 纯文本请求的响应缓存条数（仅temperature为0时启用，0表示关闭）
+            stream_responses: predict_mm是否以流式请求获取响应（需要服务端支持stream_options.include_usage，
+                否则无法统计token用量）；默认一次性invoke
         """
-        if not LANGCHAIN_AVAILABLE:
+        if not _load_langchain():
             raise ImportError(
                 "LangChain is not available. Please install it with: "
                 "pip install langchain langchain-openai"
@@ -68,16 +191,139 @@ class LangChainLLMProvider(LLMProvider):
             temperature=temperature,
             max_retries=max_retries,
             timeout=30,
+            # 流式响应的最后一段附带token用量（仅在启用流式响应时请求，不支持该选项的服务端不受影响）
+            stream_usage=bool(stream_responses),
         )
+        self.stream_responses = bool(stream_responses)
         self.model_name = model_name
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.image_format = "jpeg" if str(image_format).lower() in ("jpeg", "jpg") else "png"
+        # 多张图片并行编码的线程池（PIL编码时释放GIL，首次需要时创建）
+        self._encode_pool: Optional[ThreadPoolExecutor] = None
+        # 提供者由LLMFactory在进程内共享，多个线程可能同时编码/关闭，线程池的创建、提交与替换需加锁
+        self._encode_pool_lock = threading.Lock()
+        # temperature为0时输出确定，相同的纯文本请求直接复用上次的响应
+        self._response_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._response_cache_size = int(response_cache_size or 0) if temperature == 0.0 else 0
+        self._response_cache_lock = threading.Lock()
+    
+    def close(self) -> None:
+        """关闭图片编码线程池（实例仍可继续使用，下次需要时重新创建）"""
+        with self._encode_pool_lock:
+            pool, self._encode_pool = self._encode_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _to_data_urls(self, images: List[Union[str, np.ndarray]]) -> List[str]:
+        """将图片转换为data URL，多张图片时并行编码（保持顺序）"""
+        if len(images) <= 1:
+            return [image_to_data_url(image, self.image_format) for image in images]
+        with self._encode_pool_lock:
+            if self._encode_pool is None:
+                self._encode_pool = ThreadPoolExecutor(
+                    max_workers=min(8, os.cpu_count() or 1),
+                    thread_name_prefix="image-encode"
+                )
+            # map在返回前即提交全部任务，之后close关闭线程池也会等已提交的任务完成
+            results = self._encode_pool.map(
+                lambda image: image_to_data_url(image, self.image_format), images
+            )
+        return list(results)
     
     def predict(
         self,
         text_prompt: str,
     ) -> tuple[str, Optional[Any], Any]:
-        """调用文本LLM"""
-        return self.predict_mm(text_prompt, [])
+        """调用文本LLM（temperature为0时相同提示复用缓存的响应）"""
+        if not self._response_cache_size:
+            return self.predict_mm(text_prompt, [])
+        key = hashlib.blake2b(
+            f"{self.model_name}\x00{text_prompt}".encode("utf-8"), digest_size=16
+        ).digest()
+        with self._response_cache_lock:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                self._response_cache.move_to_end(key)
+                return cached
+        result = self.predict_mm(text_prompt, [])
+        if result[2] is None:
+            # 调用失败（predict_mm返回错误文本）时不缓存
+            return result
+        with self._response_cache_lock:
+            self._response_cache[key] = result
+            if len(self._response_cache) > self._response_cache_size:
+                self._response_cache.popitem(last=False)
+        return result
     
+    def _build_messages(
+        self,
+        text_prompt: str,
+        images: List[Union[str, np.ndarray]],
+        messages: Optional[List[dict]]
+    ) -> Tuple[Optional[List[dict]], list]:
+        """构建请求消息
+
+        Returns:
+            (单条用户消息的content（传入messages时为None）, LangChain消息列表)
+        """
+        if messages is None:
+            # 构建消息
+            content = [{"type": "text", "text": text_prompt}]
+            
+            # 添加图片（仅支持路径和numpy数组）
+            valid_images = [image for image in images if isinstance(image, (str, np.ndarray))]
+            for img_url in self._to_data_urls(valid_images):
+                content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": img_url
+                    }
+                })
+            return content, [HumanMessage(content=content)]
+
+        # 先并行编码消息中的全部图片
+        message_images = [
+            item['image']
+            for msg in messages
+            if isinstance(msg.get('content', []), list)
+            for item in msg.get('content', [])
+            if isinstance(item, dict) and 'text' not in item and 'image' in item
+        ]
+        image_urls = iter(self._to_data_urls(message_images))
+        
+        # 转换消息格式
+        langchain_messages = []
+        for msg in messages:
+            role = msg.get('role', 'user')
+            content = msg.get('content', [])
+            
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            
+            # 处理多模态内容
+            processed_content = []
+            for item in content:
+                if isinstance(item, dict):
+                    if 'text' in item:
+                        processed_content.append({"type": "text", "text": item['text']})
+                    elif 'image' in item:
+                        img_url = next(image_urls)
+                        processed_content.append({
+                            "type": "image_url",
+                            "image_url": {
+                                "url": img_url
+                            }
+                        })
+                else:
+                    processed_content.append({"type": "text", "text": str(item)})
+            
+            if role == 'system':
+                langchain_messages.append(SystemMessage(content=processed_content))
+            else:
+                langchain_messages.append(HumanMessage(content=processed_content))
+        return None, langchain_messages
+
     def predict_mm(
         self,
         text_prompt: str,
@@ -95,63 +341,17 @@ class LangChainLLMProvider(LLMProvider):
             images = []
         
         try:
-            if messages is None:
-                # 构建消息
-                content = [{"type": "text", "text": text_prompt}]
-                
-                # 添加图片
-                for image in images:
-                    if isinstance(image, str):
-                        # 如果是路径，转换为base64
-                        img_data = image_to_base64(image)
-                    elif isinstance(image, np.ndarray):
-                        # 如果是numpy数组，转换为base64
-                        img_data = image_to_base64(image)
-                    else:
-                        continue
-                    
-                    content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{img_data}"
-                        }
-                    })
-                
-                langchain_messages = [HumanMessage(content=content)]
-            else:
-                # 转换消息格式
-                langchain_messages = []
-                for msg in messages:
-                    role = msg.get('role', 'user')
-                    content = msg.get('content', [])
-                    
-                    if isinstance(content, str):
-                        content = [{"type": "text", "text": content}]
-                    
-                    # 处理多模态内容
-                    processed_content = []
-                    for item in content:
-                        if isinstance(item, dict):
-                            if 'text' in item:
-                                processed_content.append({"type": "text", "text": item['text']})
-                            elif 'image' in item:
-                                img_data = image_to_base64(item['image'])
-                                processed_content.append({
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{img_data}"
-                                    }
-                                })
-                        else:
-                            processed_content.append({"type": "text", "text": str(item)})
-                    
-                    if role == 'system':
-                        langchain_messages.append(SystemMessage(content=processed_content))
-                    else:
-                        langchain_messages.append(HumanMessage(content=processed_content))
+            _, langchain_messages = self._build_messages(text_prompt, images, messages)
             
-            # 调用LLM
-            response = self.llm.invoke(langchain_messages)
+            if self.stream_responses:
+                # 流式调用LLM，收集各段后一次合并为完整响应（合并后的usage_metadata来自最后一段）
+                chunks = list(self._stream_chunks(langchain_messages))
+                if not chunks:
+                    return ("", messages, None)
+                response = chunks[0] + chunks[1:] if len(chunks) > 1 else chunks[0]
+            else:
+                # 调用LLM
+                response = self.llm.invoke(langchain_messages)
             
             # 提取响应内容
             if hasattr(response, 'content'):
@@ -165,3 +365,45 @@ class LangChainLLMProvider(LLMProvider):
             print(f'Error calling LangChain LLM: {e}')
             return (f"Error: {str(e)}", None, None)
 
+    def predict_mm_stream(
+        self,
+        text_prompt: str,
+        images: List[Union[str, np.ndarray]] = None,
+        messages: Optional[List[dict]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        """流式调用多模态LLM，按到达顺序逐段产出输出文本
+
+        调用方可边接收边解析；发现输出无效时set cancel_event或直接停止迭代，
+        即可关闭连接、不再等待剩余的生成。
+
+        Args:
+            text_prompt: 文本提示
+            images: 图片列表
+            messages: 可选的消息历史（如果提供，将使用此而非text_prompt）
+            cancel_event: 可选的取消标志，被set后在下一段到达时停止
+
+        Yields:
+            输出文本片段
+
+        Raises:
+            Exception: 请求失败时抛出LangChain/OpenAI的原始异常
+        """
+        _, langchain_messages = self._build_messages(text_prompt, images or [], messages)
+        for chunk in self._stream_chunks(langchain_messages, cancel_event):
+            text = getattr(chunk, 'content', chunk)
+            if isinstance(text, str) and text:
+                yield text
+
+    def _stream_chunks(self, langchain_messages: list, cancel_event: Optional[threading.Event] = None) -> Iterator[Any]:
+        """逐段产出LangChain流式响应，取消或停止迭代时关闭连接"""
+        stream = self.llm.stream(langchain_messages)
+        try:
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                yield chunk
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
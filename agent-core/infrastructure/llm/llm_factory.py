@@ -1,8 +1,14 @@
 """LLM工厂：用于创建LLM实例"""
-from typing import Optional
+import json
+import hashlib
+import threading
+from typing import Dict, Optional
 from .llm_provider import LLMProvider
-from .langchain_llm import LangChainLLMProvider
-from .gui_owl_wrapper import GUIOwlWrapperAdapter
+
+
+# 相同参数创建的提供者实例共享（复用其HTTP连接池），键为参数的规范化摘要
+_LLM_CACHE: Dict[bytes, LLMProvider] = {}
+_LLM_CACHE_LOCK = threading.Lock()
 
 
 class LLMFactory:
@@ -18,7 +24,7 @@ class LLMFactory:
         max_retry: int = 10,
         **kwargs
     ) -> LLMProvider:
-        """创建LLM提供者实例
+        """创建LLM提供者实例（相同参数返回同一实例）
         
         Args:
             provider_type: 提供者类型 ("langchain" 或 "gui_owl")
@@ -38,15 +44,50 @@ class LLMFactory:
         if not api_key or not base_url or not model_name:
             raise ValueError("api_key, base_url, and model_name are required")
         
+        # 只取实际传给提供者的参数，使省略参数与显式传入默认值得到相同的键
+        options = {
+            "image_format": kwargs.get("image_format", "png"),
+            "stream_responses": bool(kwargs.get("stream_responses", False)),
+        } if provider_type == "langchain" else {}
+        key = hashlib.blake2b(
+            json.dumps(
+                [provider_type, api_key, base_url, model_name, float(temperature), int(max_retry), options],
+                sort_keys=True, default=str
+            ).encode("utf-8"),
+            digest_size=16
+        ).digest()
+        with _LLM_CACHE_LOCK:
+            provider = _LLM_CACHE.get(key)
+            if provider is None:
+                provider = LLMFactory._create_provider(
+                    provider_type, api_key, base_url, model_name, temperature, max_retry, **options
+                )
+                _LLM_CACHE[key] = provider
+        return provider
+
+    @staticmethod
+    def _create_provider(
+        provider_type: str,
+        api_key: str,
+        base_url: str,
+        model_name: str,
+        temperature: float,
+        max_retry: int,
+        **kwargs
+    ) -> LLMProvider:
         if provider_type == "langchain":
+            from .langchain_llm import LangChainLLMProvider
             return LangChainLLMProvider(
                 api_key=api_key,
                 base_url=base_url,
                 model_name=model_name,
                 temperature=temperature,
                 max_retries=max_retry,
+                image_format=kwargs["image_format"],
+                stream_responses=kwargs["stream_responses"],
             )
         elif provider_type == "gui_owl":
+            from .gui_owl_wrapper import GUIOwlWrapperAdapter
             return GUIOwlWrapperAdapter(
                 api_key=api_key,
                 base_url=base_url,
@@ -57,6 +98,12 @@ class LLMFactory:
         else:
             raise ValueError(f"Unsupported provider type: {provider_type}. Use 'langchain' or 'gui_owl'")
     
+    @staticmethod
+    def clear_cache() -> None:
+        """清空已缓存的提供者实例"""
+        with _LLM_CACHE_LOCK:
+            _LLM_CACHE.clear()
+    
     @staticmethod
     def create_from_config(config: dict) -> LLMProvider:
         """从配置字典创建LLM提供者
@@ -74,5 +121,7 @@ class LLMFactory:
             model_name=config.get("model") or config.get("model_name"),
             temperature=config.get("temperature", 0.0),
             max_retry=config.get("max_retry", 10),
+            image_format=config.get("image_format", "png"),
+            stream_responses=config.get("stream_responses", False),
         )
 
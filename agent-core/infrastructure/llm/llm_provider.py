@@ -41,3 +41,6 @@ class LLMProvider(ABC):
         """
         pass
 
+    def close(self) -> None:
+        """释放提供者持有的连接等资源（默认无操作）"""
+        pass
@@ -1,11 +1,47 @@
 import os
 import argparse
+import asyncio
 import json
 import re
+import functools
 import time
+import hashlib
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openpyxl import Workbook, load_workbook
+from xml.sax.saxutils import escape
 from config.settings import resolve_summary_llm_params
+from infrastructure.storage.response_cache import ResponseCache, default_cache_path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# openpyxl导入较慢，仅在需要完整读写工作簿时才导入（sidecar拼接路径不依赖它）
+_openpyxl = None
+# 与openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE一致：XML不允许的控制字符
+_ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+def _get_openpyxl():
+    global _openpyxl
+    if _openpyxl is None:
+        import openpyxl
+        _openpyxl = openpyxl
+    return _openpyxl
+
+def _column_letter(col):
+    # 1 -> A, 27 -> AA
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
 
 def _normalize_output_lang(output_lang):
     v = (output_lang or "").strip().lower()
@@ -16,6 +52,13 @@ def _normalize_output_lang(output_lang):
 def _localize(output_lang, zh, en):
     return zh if output_lang == "zh" else en
 
+# _number_steps 使用的正则，只编译一次
+# 编号步骤的起点 "N. "（数字串须从头匹配）与后续边界（前面必须是空白），均为线性扫描
+_FIRST_NUM_RE = re.compile(r'(?<!\d)\d+\.\s+')
+_NEXT_NUM_RE = re.compile(r'(?<=\s)\d+\.\s+')
+_LEAD_NUM_RE = re.compile(r'^\d+\.\s*')
+_NEWLINE_RE = re.compile(r"[\r\n]+")
+
 def _headers_simple(output_lang):
     if output_lang == "zh":
         return ["测试用例编号", "模块名称", "用例说明", "执行步骤", "成功步骤", "输入数据", "执行结果", "执行原因", "token总数", "探索步骤数", "执行时间"]
@@ -26,7 +69,7 @@ def _headers_full(output_lang):
 
 def _ensure_wb_and_sheet(path, headers):
     if os.path.exists(path):
-        wb = load_workbook(path)
+        wb = _get_openpyxl().load_workbook(path)
         ws = wb.active
         if ws.max_row >= 1:
             existing_headers = [c.value for c in ws[1]]
@@ -54,26 +97,205 @@ def _ensure_wb_and_sheet(path, headers):
             ws.append(headers)
             wb.save(path)
         return wb, ws
-    wb = Workbook()
+    wb = _get_openpyxl().Workbook()
     ws = wb.active
     ws.title = "Sheet1"
     ws.append(headers)
     wb.save(path)
     return wb, ws
 
+def _load_json(path):
+    """读取JSON文件（见_loads_json）"""
+    with open(path, "rb") as f:
+        return _loads_json(f.read())
+
+def _loads_json(raw):
+    """解析JSON字节（安装了orjson时用orjson解析，其不接受的内容如NaN回退到json）"""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+# task_results.json中报告用到的顶层字段；文件较大（如包含完整轨迹）时用ijson流式只取这些字段
+_TASK_RESULT_KEYS = frozenset({
+    "step_limit", "hit_step_limit", "task_status", "total_tokens", "start_dtime", "finish_dtime",
+    "test_status_report", "test_status_report_zh", "status_reason", "status_reason_zh",
+})
+_STREAM_MIN_BYTES = 64 * 1024
+
+def _load_task_results(path):
+    """读取task_results.json：小文件整体解析，大文件流式提取报告所需的顶层标量字段"""
+    with open(path, "rb") as f:
+        if ijson is None or os.fstat(f.fileno()).st_size < _STREAM_MIN_BYTES:
+            return _loads_json(f.read())
+        tr = {}
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix in _TASK_RESULT_KEYS and event in ("string", "number", "boolean", "null"):
+                tr[prefix] = value
+        return tr
+
+def _meta_path(path):
+    return path + ".meta.json"
+
+def _read_meta(path):
+    try:
+        return _load_json(_meta_path(path))
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(path, headers, rows, sheet):
+    st = os.stat(path)
+    meta = {"headers": headers, "rows": rows, "sheet": sheet, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    with open(_meta_path(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+def _meta_matches(path, meta, headers):
+    """sidecar记录的是本模块最后一次写入后的文件状态，且表头一致时才可直接追加"""
+    if not isinstance(meta, dict) or meta.get("headers") != headers:
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns
+
+def _row_xml(row_idx, row):
+    cells = []
+    for col, value in enumerate(row, 1):
+        if value is None or value == "":
+            continue
+        ref = f"{_column_letter(col)}{row_idx}"
+        if isinstance(value, bool):
+            cells.append(f'<c r="{ref}" t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}" t="n"><v>{value}</v></c>')
+        else:
+            text = escape(str(value))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{row_idx}">{"".join(cells)}</row>'.encode("utf-8")
+
+def _splice_rows(path, sheet, first_row_idx, rows, n_cols):
+    """把若干行直接拼接到工作表XML的</sheetData>之前（不解析/重建整个工作簿）
+
+    用ZipFile写出到同目录的临时文件后替换原文件：其余条目按原顺序原样写入，只改动工作表XML。
+    """
+    last_row_idx = first_row_idx + len(rows) - 1
+    with zipfile.ZipFile(path, "r") as zin:
+        xml = zin.read(sheet)
+        end = xml.rfind(b"</sheetData>")
+        if end < 0:
+            return False
+        rows_xml = b"".join(_row_xml(first_row_idx + i, row) for i, row in enumerate(rows))
+        xml = xml[:end] + rows_xml + xml[end:]
+        xml = re.sub(
+            rb'<dimension ref="[^"]*"\s*/>',
+            f'<dimension ref="A1:{_column_letter(n_cols)}{last_row_idx}"/>'.encode("ascii"),
+            xml,
+            count=1,
+        )
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                for item in zin.infolist():
+                    zout.writestr(item, xml if item.filename == sheet else zin.read(item.filename))
+            # mkstemp创建的临时文件为0600，替换前恢复报告文件原有的权限
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+    return True
+
+def _append_rows(path, headers, rows):
+    """追加若干行到报告
+
+    新建文件时用write_only工作簿写入；之后若sidecar表明文件自上次写入后未被改动且表头一致，
+    直接拼接行XML，不load_workbook也不重新save整个工作簿。其余情况（无sidecar、文件被外部修改、
+    表头变化、含非法字符等）回退到openpyxl完整读写。
+    """
+    if not os.path.exists(path):
+        wb = _get_openpyxl().Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
+        _write_meta(path, headers, 1 + len(rows), "xl/worksheets/sheet1.xml")
+        return
+    if not rows:
+        return
+    meta = _read_meta(path)
+    has_illegal = any(isinstance(v, str) and _ILLEGAL_CHARACTERS_RE.search(v) for row in rows for v in row)
+    if not has_illegal and _meta_matches(path, meta, headers):
+        first_row_idx = int(meta["rows"]) + 1
+        n_cols = max([len(headers)] + [len(row) for row in rows])
+        try:
+            spliced = _splice_rows(path, meta["sheet"], first_row_idx, rows, n_cols)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            spliced = False
+        if spliced:
+            _write_meta(path, headers, first_row_idx + len(rows) - 1, meta["sheet"])
+            return
+    wb, ws = _ensure_wb_and_sheet(path, headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    _write_meta(path, headers, ws.max_row, f"xl/worksheets/sheet{wb.worksheets.index(ws) + 1}.xml")
+
+def _append_row_fast(path, row, headers):
+    """追加一行到报告（见_append_rows）"""
+    _append_rows(path, headers, [row])
+
+class ReportBatcher:
+    """收集多行后一次写入报告
+
+    用法：
+        with ReportBatcher(path, headers) as batcher:
+            batcher.append(row)
+    退出时写入一次（块内出现异常时也写入已追加的行）
+    """
+
+    def __init__(self, path, headers):
+        self.path = path
+        self.headers = headers
+        self.rows = []
+
+    def __enter__(self):
+        out_dir = os.path.dirname(self.path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        return self
+
+    def append(self, row):
+        self.rows.append(row)
+
+    def __exit__(self, exc_type, exc, tb):
+        _append_rows(self.path, self.headers, self.rows)
+        self.rows = []
+        return False
+
+# 文件名中不允许的字符（str.translate删除表）
+_INVALID_NAME_TABLE = str.maketrans('', '', '<>:"/\\|?*')
+
 def _sanitize_name(s):
-    invalid = '<>:"/\\|?*'
-    r = ''.join(ch for ch in (s or "") if ch not in invalid)
-    r = r.strip()
-    if len(r) == 0:
-        r = "Unknown"
-    return r
-
-def _count_exploration_steps(steps_dir: str) -> int:
-    if not steps_dir or not os.path.exists(steps_dir):
-        return 0
+    r = (s or "").translate(_INVALID_NAME_TABLE).strip()
+    return r or "Unknown"
+
+def _scandir_names(path):
+    """目录下的条目名集合（一次scandir，目录不存在时为空）"""
+    try:
+        with os.scandir(path) as it:
+            return {entry.name for entry in it}
+    except OSError:
+        return set()
+
+def _list_step_folders(steps_dir):
+    """Steps目录下的step_*条目，按步骤号排序：[(步骤号, 目录名), ...]"""
     step_folders = []
-    for d in os.listdir(steps_dir):
+    for d in _scandir_names(steps_dir) if steps_dir else ():
         if d.startswith("step_"):
             try:
                 n = int(d.split("_")[-1])
@@ -81,16 +303,32 @@ def _count_exploration_steps(steps_dir: str) -> int:
                 n = 0
             step_folders.append((n, d))
     step_folders.sort(key=lambda x: x[0])
+    return step_folders
+
+def _run_dir_entries(logs_root):
+    """logs_root下的运行目录项（T-*），只scandir一次；logs_root不存在时抛ValueError"""
+    try:
+        with os.scandir(logs_root) as it:
+            return [entry for entry in it if entry.name.startswith("T-") and entry.is_dir()]
+    except FileNotFoundError:
+        raise ValueError("logs_root not found")
+
+def _latest_run_dir(entries, prefix):
+    """以prefix开头的运行目录中修改时间最新的一个（只stat匹配的目录项），没有时返回None"""
+    matched = [entry for entry in entries if entry.name.startswith(prefix)]
+    if not matched:
+        return None
+    return max(matched, key=lambda entry: entry.stat().st_mtime).path
+
+def _count_exploration_steps(steps_dir: str, step_folders=None) -> int:
+    if step_folders is None:
+        step_folders = _list_step_folders(steps_dir)
     if not step_folders:
         return 0
     total = len(step_folders)
     _, lastd = step_folders[-1]
-    last_step_dir = os.path.join(steps_dir, lastd)
-    has_task_judge = any(
-        os.path.exists(os.path.join(last_step_dir, name))
-        for name in ("task_judge.json", "task_judge.zh.json")
-    )
-    if has_task_judge:
+    last_step_names = _scandir_names(os.path.join(steps_dir, lastd))
+    if last_step_names & {"task_judge.json", "task_judge.zh.json"}:
         total -= 1
     return max(total, 0)
 
@@ -108,6 +346,13 @@ def _parse_dt(s):
     t = (s or "").strip()
     if not t:
         return None
+    # 常见的 "YYYY-MM-DD HH:MM:SS[.ffffff]" 直接用fromisoformat解析；带时区的结果不用（无法与naive时间相减）
+    try:
+        dt = datetime.fromisoformat(t)
+        if dt.tzinfo is None:
+            return dt
+    except ValueError:
+        pass
     for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
         try:
             return datetime.strptime(t, fmt)
@@ -122,11 +367,13 @@ def _number_steps(s):
     t = t.replace("Finished", "").strip()
     parts = []
     tmp = t.replace("\r\n", "\n").replace("\r", "\n")
-    numbered_pattern = r'\d+\.\s+(.+?)(?=\s+\d+\.\s+|$)'
-    matches = re.findall(numbered_pattern, tmp, re.DOTALL)
-    if matches:
-        for match in matches:
-            content = match.strip()
+    mark = _FIRST_NUM_RE.search(tmp)
+    if mark:
+        # 每段内容从上一个编号之后到下一个"空白+N. "之前
+        while mark:
+            start = mark.end()
+            mark = _NEXT_NUM_RE.search(tmp, start + 1)
+            content = tmp[start:mark.start() if mark else len(tmp)].strip()
             if content:
                 parts.append(content)
     elif tmp.startswith("- ") or " - " in tmp:
@@ -134,50 +381,63 @@ def _number_steps(s):
         for p in tmp.split(" - "):
             ps = p.strip()
             if ps:
-                ps = re.sub(r'^\d+\.\s*', '', ps).strip()
+                ps = _LEAD_NUM_RE.sub('', ps).strip()
                 if ps:
                     parts.append(ps)
     else:
-        for ln in re.split(r"[\r\n]+", tmp):
+        for ln in _NEWLINE_RE.split(tmp):
             ps = ln.strip(" -")
             if ps:
-                ps = re.sub(r'^\d+\.\s*', '', ps).strip()
+                ps = _LEAD_NUM_RE.sub('', ps).strip()
                 if ps:
                     parts.append(ps)
-    return "\n".join(f"{i+1}. {parts[i]}" for i in range(len(parts)))
+    return "\n".join(f"{i}. {p}" for i, p in enumerate(parts, 1))
 
 def _read_json_file_safely(file_path, max_retries=3, retry_delay=0.5):
+    # 文件可能正在被写入：重试间隔从10ms起指数增长，最长retry_delay
+    delay = min(0.01, retry_delay)
     for attempt in range(max_retries):
-        if not os.path.exists(file_path):
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-            return None
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data
+            return _load_json(file_path)
         except (json.JSONDecodeError, IOError, ValueError):
             if attempt == max_retries - 1:
                 return None
-            time.sleep(retry_delay)
+        time.sleep(delay)
+        delay = min(delay * 2, retry_delay)
     return None
 
-def _get_total_plan_from_files(run_dir):
+def _get_total_plan_from_files(run_dir, run_files=None):
+    if run_files is None:
+        run_files = _scandir_names(run_dir)
     exec_steps = ""
-    script_path = os.path.join(run_dir, "script.json")
-    if os.path.exists(script_path):
-        sj = _read_json_file_safely(script_path)
+    if "script.json" in run_files:
+        sj = _read_json_file_safely(os.path.join(run_dir, "script.json"))
         if sj:
             exec_steps = sj.get("total_plan") or sj.get("goal") or ""
     if not exec_steps:
-        infopool_path = os.path.join(run_dir, "infopool.json")
-        if os.path.exists(infopool_path):
-            ip = _read_json_file_safely(infopool_path)
+        if "infopool.json" in run_files:
+            ip = _read_json_file_safely(os.path.join(run_dir, "infopool.json"))
             if ip:
                 exec_steps = ip.get("total_plan") or ""
     return exec_steps
 
+# 读取运行目录下小文件的共享线程池（网络存储上每次读取有固定延迟，几个文件并发读取）
+_io_pool = None
+_io_pool_lock = threading.Lock()
+
+def _get_io_pool():
+    global _io_pool
+    with _io_pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="report-io")
+        return _io_pool
+
+# 成功步骤筛选的LLM响应缓存：相同模型/温度/语言/执行步骤直接复用上次的响应
+_filter_cache = ResponseCache(default_cache_path("filter_steps.db"))
+
+def _llm_cache_key(model_name, temperature, output_lang, exec_steps):
+    return hashlib.sha256(f"{model_name}|{temperature}|{output_lang}|{exec_steps}".encode("utf-8")).hexdigest()
+
 def _filter_successful_steps(
     exec_steps,
     output_lang,
@@ -212,6 +472,11 @@ def _filter_successful_steps(
             return exec_steps
         if not base_url or not model_name:
             return exec_steps
+        
+        cache_key = _llm_cache_key(model_name, temperature, output_lang, exec_steps)
+        cached = _filter_cache.get(cache_key)
+        if cached is not None:
+            return _number_steps(cached)
             
         llm = LLMFactory.create(
             provider_type=provider_type,
@@ -262,106 +527,81 @@ def _filter_successful_steps(
 ### 输出 ###
 Output only the filtered numbered steps, without any extra text.
 """
-        response, _, _ = llm.predict_mm(prompt, [])
+        response, _, raw_response = llm.predict_mm(prompt, [])
+        if response and raw_response is not None:
+            _filter_cache.put(cache_key, response)
         return _number_steps(response)
     except Exception as e:
         print(f"Failed to filter steps with LLM: {e}")
         return exec_steps
 
-def generate_excel_report(
-    scenario_file,
-    app_id,
-    scenario_id,
-    logs_root="./output",
-    output_excel_path="./reports/report.xlsx",
-    output_lang="zh",
+@functools.lru_cache(maxsize=32)
+def _load_scenario_index(path, mtime_ns, size):
+    """解析场景文件并按id建立索引（同一id取第一个）；mtime/大小作为缓存键的一部分，文件改动后重新读取"""
+    data = _load_json(path)
+    apps = data.get("apps") or []
+    scenarios = data.get("scenarios") or []
+    app_names = {}
+    for a in apps:
+        app_names.setdefault(a.get("id"), a.get("name"))
+    scenario_defs = {}
+    for s in scenarios:
+        scenario_defs.setdefault(s.get("id"), s)
+    default_app_name = apps[0].get("name") if apps else None
+    default_scd = scenarios[0] if scenarios else None
+    return app_names, scenario_defs, default_app_name, default_scd
+
+def _load_scenario(scenario_file, app_id, scenario_id):
+    """读取场景文件，返回 (应用名, 场景定义)；找不到对应id时取第一个"""
+    try:
+        st = os.stat(scenario_file)
+    except OSError:
+        raise ValueError("scenario_file not found")
+    app_names, scenario_defs, default_app_name, default_scd = _load_scenario_index(
+        os.path.abspath(scenario_file), st.st_mtime_ns, st.st_size
+    )
+    app_name = app_names.get(app_id)
+    if app_name is None:
+        app_name = default_app_name
+    scd = scenario_defs.get(scenario_id)
+    if scd is None:
+        scd = default_scd
+    return app_name, scd
+
+def _collect_run_row(
+    run_dir,
+    output_lang,
+    scd,
     vllm_api_key=None,
     vllm_base_url=None,
     vllm_model_name=None,
     summary_api_key=None,
     summary_base_url=None,
     summary_model_name=None,
+    run_files=None,
 ):
-    output_lang = _normalize_output_lang(output_lang)
-    if not os.path.exists(scenario_file):
-        raise ValueError("scenario_file not found")
-    with open(scenario_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    apps = data.get("apps") or []
-    scenarios = data.get("scenarios") or []
-    app_name = None
-    for a in apps:
-        if a.get("id") == app_id:
-            app_name = a.get("name")
-            break
-    if app_name is None and apps:
-        app_name = apps[0].get("name")
-    scd = None
-    for s in scenarios:
-        if s.get("id") == scenario_id:
-            scd = s
-            break
-    if scd is None and scenarios:
-        scd = scenarios[0]
+    """汇总单次运行目录的结果，生成报告行（output_lang须已规范化；run_files为已列出的目录条目名）"""
     module_name = scd.get("name") if scd else ""
     case_desc = scd.get("description") if scd else ""
     extra_info_obj = scd.get("extra-info") if scd else {}
     extra_info_str = json.dumps(extra_info_obj, ensure_ascii=False)
-    safe_app = _sanitize_name(app_name)
-    safe_sce = _sanitize_name(module_name)
-    if not os.path.exists(logs_root):
-        raise ValueError("logs_root not found")
-    candidates = []
-    for d in os.listdir(logs_root):
-        p = os.path.join(logs_root, d)
-        if os.path.isdir(p) and d.startswith(f"T-{safe_app}-{safe_sce}-"):
-            candidates.append((p, os.path.getmtime(p)))
-    if not candidates:
-        for d in os.listdir(logs_root):
-            p = os.path.join(logs_root, d)
-            if os.path.isdir(p) and d.startswith("T-"):
-                candidates.append((p, os.path.getmtime(p)))
-    if not candidates:
-        raise ValueError("no run directories found")
-    candidates.sort(key=lambda x: x[1], reverse=True)
-    run_dir = candidates[0][0]
     case_id = os.path.basename(run_dir)
+    if run_files is None:
+        run_files = _scandir_names(run_dir)
     steps_dir = os.path.join(run_dir, "Steps")
-    step_folders = []
-    if os.path.exists(steps_dir):
-        for d in os.listdir(steps_dir):
-            if d.startswith("step_"):
-                try:
-                    n = int(d.split("_")[-1])
-                except Exception:
-                    n = 0
-                step_folders.append((n, d))
-    step_folders.sort(key=lambda x: x[0])
-    last_planner_thought = ""
-    last_error_desc = ""
-    if step_folders:
-        n, lastd = step_folders[-1]
-        mgr = os.path.join(steps_dir, lastd, "planner.zh.json" if output_lang == "zh" else "planner.json")
-        ref = os.path.join(steps_dir, lastd, "reflector.zh.json" if output_lang == "zh" else "reflector.json")
-        if os.path.exists(mgr):
-            with open(mgr, "r", encoding="utf-8") as f:
-                mj = json.load(f)
-            last_planner_thought = _extract_thought(mj.get("response") or "")
-        if os.path.exists(ref):
-            with open(ref, "r", encoding="utf-8") as f:
-                rj = json.load(f)
-            last_error_desc = _extract_error(rj.get("response") or "")
-    exploration_steps = _count_exploration_steps(steps_dir)
-    task_results_path = os.path.join(run_dir, "task_results.json")
+    # 步骤目录、task_results.json 与计划文件互不依赖，并发读取
+    pool = _get_io_pool()
+    exploration_future = pool.submit(_count_exploration_steps, steps_dir) if "Steps" in run_files else None
+    tr_future = pool.submit(_load_task_results, os.path.join(run_dir, "task_results.json")) if "task_results.json" in run_files else None
+    plan_future = pool.submit(_get_total_plan_from_files, run_dir, run_files)
+    exploration_steps = exploration_future.result() if exploration_future else 0
     step_limit = 1.0
     task_status = ""
     test_status_report = ""
     total_tokens = 0
-    execution_steps = 0
     duration_seconds = ""
-    if os.path.exists(task_results_path):
-        with open(task_results_path, "r", encoding="utf-8") as f:
-            tr = json.load(f)
+    if tr_future:
+        tr = tr_future.result()
         step_limit = tr.get("step_limit", tr.get("hit_step_limit", 1.0))
         task_status = tr.get("task_status", "")
         if output_lang == "zh":
@@ -374,12 +614,11 @@ def generate_excel_report(
         else:
             test_status_report = tr.get("test_status_report", "") or tr.get("status_reason", "")
         total_tokens = int(tr.get("total_tokens") or 0)
-        execution_steps = int(tr.get("execution_steps") or 0)
         start_dt = _parse_dt(tr.get("start_dtime") or "")
         finish_dt = _parse_dt(tr.get("finish_dtime") or "")
         if start_dt and finish_dt:
             duration_seconds = round((finish_dt - start_dt).total_seconds(), 3)
-    exec_steps = _get_total_plan_from_files(run_dir)
+    exec_steps = plan_future.result()
     completed = False if (step_limit and float(step_limit) != 0.0) else True
     if isinstance(task_status, str) and task_status.strip().lower() in ("not completed", "not_completed"):
         completed = False
@@ -406,17 +645,49 @@ def generate_excel_report(
         if completed
         else ""
     )
-    
+    return [case_id, module_name or "", case_desc or "", formatted_exec_steps or "", success_steps, extra_info_str or "", exec_result, exec_reason, total_tokens, exploration_steps, duration_seconds]
+
+def generate_excel_report(
+    scenario_file,
+    app_id,
+    scenario_id,
+    logs_root="./output",
+    output_excel_path="./reports/report.xlsx",
+    output_lang="zh",
+    vllm_api_key=None,
+    vllm_base_url=None,
+    vllm_model_name=None,
+    summary_api_key=None,
+    summary_base_url=None,
+    summary_model_name=None,
+):
+    output_lang = _normalize_output_lang(output_lang)
+    app_name, scd = _load_scenario(scenario_file, app_id, scenario_id)
+    module_name = scd.get("name") if scd else ""
+    safe_app = _sanitize_name(app_name)
+    safe_sce = _sanitize_name(module_name)
+    entries = _run_dir_entries(logs_root)
+    run_dir = _latest_run_dir(entries, f"T-{safe_app}-{safe_sce}-") or _latest_run_dir(entries, "T-")
+    if not run_dir:
+        raise ValueError("no run directories found")
+    row = _collect_run_row(
+        run_dir,
+        output_lang,
+        scd,
+        vllm_api_key=vllm_api_key,
+        vllm_base_url=vllm_base_url,
+        vllm_model_name=vllm_model_name,
+        summary_api_key=summary_api_key,
+        summary_base_url=summary_base_url,
+        summary_model_name=summary_model_name,
+    )
     headers = _headers_simple(output_lang)
-    row = [case_id, module_name or "", case_desc or "", formatted_exec_steps or "", success_steps, extra_info_str or "", exec_result, exec_reason, total_tokens, exploration_steps, duration_seconds]
     out_dir = os.path.dirname(output_excel_path)
     if out_dir and not os.path.exists(out_dir):
         os.makedirs(out_dir)
-    wb, ws = _ensure_wb_and_sheet(output_excel_path, headers)
-    ws.append(row)
-    wb.save(output_excel_path)
+    _append_row_fast(output_excel_path, row, headers)
 
-def write_report_for_run(
+def _build_row_for_run(
     run_dir,
     scenario_file,
     app_id,
@@ -429,119 +700,117 @@ def write_report_for_run(
     summary_base_url=None,
     summary_model_name=None,
 ):
+    """汇总单次运行目录的结果，返回 (表头, 行)"""
     output_lang = _normalize_output_lang(output_lang)
-    if not os.path.exists(run_dir):
+    run_files = _scandir_names(run_dir)
+    if not run_files and not os.path.isdir(run_dir):
         raise ValueError("run_dir not found")
-    logs_root = os.path.dirname(run_dir)
-    output_excel_path = os.path.join(logs_root, "results.xlsx")
-    if not os.path.exists(scenario_file):
-        raise ValueError("scenario_file not found")
-    with open(scenario_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    apps = data.get("apps") or []
-    scenarios = data.get("scenarios") or []
-    app_name = None
-    for a in apps:
-        if a.get("id") == app_id:
-            app_name = a.get("name")
-            break
-    if app_name is None and apps:
-        app_name = apps[0].get("name")
-    scd = None
-    for s in scenarios:
-        if s.get("id") == scenario_id:
-            scd = s
-            break
-    if scd is None and scenarios:
-        scd = scenarios[0]
-    module_name = scd.get("name") if scd else ""
-    case_desc = scd.get("description") if scd else ""
-    extra_info_obj = scd.get("extra-info") if scd else {}
-    extra_info_str = json.dumps(extra_info_obj, ensure_ascii=False)
-    case_id = os.path.basename(run_dir)
-    steps_dir = os.path.join(run_dir, "Steps")
-    step_folders = []
-    if os.path.exists(steps_dir):
-        for d in os.listdir(steps_dir):
-            if d.startswith("step_"):
-                try:
-                    n = int(d.split("_")[-1])
-                except Exception:
-                    n = 0
-                step_folders.append((n, d))
-    step_folders.sort(key=lambda x: x[0])
-    last_planner_thought = ""
-    last_error_desc = ""
-    if step_folders:
-        n, lastd = step_folders[-1]
-        mgr = os.path.join(steps_dir, lastd, "planner.zh.json" if output_lang == "zh" else "planner.json")
-        ref = os.path.join(steps_dir, lastd, "reflector.zh.json" if output_lang == "zh" else "reflector.json")
-        if os.path.exists(mgr):
-            with open(mgr, "r", encoding="utf-8") as f:
-                mj = json.load(f)
-            last_planner_thought = _extract_thought(mj.get("response") or "")
-        if os.path.exists(ref):
-            with open(ref, "r", encoding="utf-8") as f:
-                rj = json.load(f)
-            last_error_desc = _extract_error(rj.get("response") or "")
-    exploration_steps = _count_exploration_steps(steps_dir)
-    task_results_path = os.path.join(run_dir, "task_results.json")
-    step_limit = 1.0
-    task_status = ""
-    test_status_report = ""
-    total_tokens = 0
-    execution_steps = 0
-    duration_seconds = ""
-    if os.path.exists(task_results_path):
-        with open(task_results_path, "r", encoding="utf-8") as f:
-            tr = json.load(f)
-        step_limit = tr.get("step_limit", tr.get("hit_step_limit", 1.0))
-        task_status = tr.get("task_status", "")
-        if output_lang == "zh":
-            test_status_report = (
-                tr.get("test_status_report_zh")
-                or tr.get("test_status_report", "")
-                or tr.get("status_reason_zh")
-                or tr.get("status_reason", "")
+    _, scd = _load_scenario(scenario_file, app_id, scenario_id)
+    row = _collect_run_row(
+        run_dir,
+        output_lang,
+        scd,
+        vllm_api_key=vllm_api_key,
+        vllm_base_url=vllm_base_url,
+        vllm_model_name=vllm_model_name,
+        summary_api_key=summary_api_key,
+        summary_base_url=summary_base_url,
+        summary_model_name=summary_model_name,
+        run_files=run_files,
+    )
+    return _headers_full(output_lang), row
+
+def _report_path_for_run(run_dir):
+    return os.path.join(os.path.dirname(run_dir), "results.xlsx")
+
+def write_report_for_run(
+    run_dir,
+    scenario_file,
+    app_id,
+    scenario_id,
+    output_lang="zh",
+    vllm_api_key=None,
+    vllm_base_url=None,
+    vllm_model_name=None,
+    summary_api_key=None,
+    summary_base_url=None,
+    summary_model_name=None,
+):
+    headers, row = _build_row_for_run(
+        run_dir,
+        scenario_file,
+        app_id,
+        scenario_id,
+        output_lang=output_lang,
+        vllm_api_key=vllm_api_key,
+        vllm_base_url=vllm_base_url,
+        vllm_model_name=vllm_model_name,
+        summary_api_key=summary_api_key,
+        summary_base_url=summary_base_url,
+        summary_model_name=summary_model_name,
+    )
+    _append_row_fast(_report_path_for_run(run_dir), row, headers)
+
+async def write_reports_for_runs_async(
+    runs,
+    scenario_file,
+    app_id,
+    output_lang="zh",
+    vllm_api_key=None,
+    vllm_base_url=None,
+    vllm_model_name=None,
+    summary_api_key=None,
+    summary_base_url=None,
+    summary_model_name=None,
+    max_concurrency=16,
+):
+    """批量写入多次运行的报告行：各次运行的行（含LLM筛选成功步骤）并发生成，每个报告文件只读写一次
+
+    Args:
+        runs: (run_dir, scenario_id) 列表；行写入各run_dir上级目录的results.xlsx
+        max_concurrency: 同时生成的行数上限（即同时进行的LLM请求数上限）
+    """
+    sem = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+    async def build(run_dir, scenario_id):
+        async with sem:
+            headers, row = await asyncio.to_thread(
+                _build_row_for_run,
+                run_dir,
+                scenario_file,
+                app_id,
+                scenario_id,
+                output_lang=output_lang,
+                vllm_api_key=vllm_api_key,
+                vllm_base_url=vllm_base_url,
+                vllm_model_name=vllm_model_name,
+                summary_api_key=summary_api_key,
+                summary_base_url=summary_base_url,
+                summary_model_name=summary_model_name,
             )
-        else:
-            test_status_report = tr.get("test_status_report", "") or tr.get("status_reason", "")
-        total_tokens = int(tr.get("total_tokens") or 0)
-        execution_steps = int(tr.get("execution_steps") or 0)
-        start_dt = _parse_dt(tr.get("start_dtime") or "")
-        finish_dt = _parse_dt(tr.get("finish_dtime") or "")
-        if start_dt and finish_dt:
-            duration_seconds = round((finish_dt - start_dt).total_seconds(), 3)
-    exec_steps = _get_total_plan_from_files(run_dir)
-    completed = False if (step_limit and float(step_limit) != 0.0) else True
-    if isinstance(task_status, str) and task_status.strip().lower() in ("not completed", "not_completed"):
-        completed = False
-    elif isinstance(task_status, str) and task_status.strip().lower() in ("completed",):
-        completed = True
-    exec_result = _localize(output_lang, "测试完成", "Completed") if completed else _localize(output_lang, "测试未完成", "Not Completed")
-    exec_reason = test_status_report or ""
-    if not exec_reason and not completed:
-        exec_reason = _localize(output_lang, "达到最大执行次数", "Reached maximum execution limit")
-    formatted_exec_steps = _number_steps(exec_steps)
-    success_steps = (
-        _filter_successful_steps(
-            formatted_exec_steps,
-            output_lang,
-            vllm_api_key=vllm_api_key,
-            vllm_base_url=vllm_base_url,
-            vllm_model_name=vllm_model_name,
-            summary_api_key=summary_api_key,
-            summary_base_url=summary_base_url,
-            summary_model_name=summary_model_name,
-        )
-        if completed
-        else ""
+        return run_dir, headers, row
+
+    results = await asyncio.gather(
+        *[build(run_dir, scenario_id) for run_dir, scenario_id in runs], return_exceptions=True
     )
-    headers = _headers_full(output_lang)
-    row = [case_id, module_name or "", case_desc or "", formatted_exec_steps or "", success_steps, extra_info_str or "", exec_result, exec_reason, total_tokens, exploration_steps, duration_seconds]
-    wb, ws = _ensure_wb_and_sheet(output_excel_path, headers)
-    ws.append(row)
-    wb.save(output_excel_path)
+    # 单次运行的行生成失败时跳过该运行，其余运行的行照常写入
+    built = []
+    for (run_dir, _), result in zip(runs, results):
+        if isinstance(result, Exception):
+            print(f"Failed to build report row for {run_dir}: {result}")
+        else:
+            built.append(result)
+    _write_built_rows(built)
+
+def _write_built_rows(built):
+    """按报告文件分组，每个文件用一个ReportBatcher写入（保持runs中的顺序）"""
+    grouped = {}
+    for run_dir, headers, row in built:
+        grouped.setdefault((_report_path_for_run(run_dir), tuple(headers)), []).append(row)
+    for (path, headers), rows in grouped.items():
+        with ReportBatcher(path, list(headers)) as batcher:
+            for row in rows:
+                batcher.append(row)
 
 def _main():
     parser = argparse.ArgumentParser(description="Generate Excel report from Mobile-Agent-v4 run directories")
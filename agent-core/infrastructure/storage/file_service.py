@@ -2,8 +2,30 @@
 import os
 import json
 import time
+import tempfile
 from typing import Optional, Dict, Any
 from pathlib import Path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 文件名中不允许的字符（str.translate删除表）
+_INVALID_FILENAME_TABLE = str.maketrans('', '', '<>:"/\\|?*')
+
+
+def _current_umask() -> int:
+    # os.umask只能“设置并返回旧值”，在导入时读取一次，避免写文件时反复修改进程状态
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 新建文件的权限（与open()创建文件时一致）；mkstemp创建的临时文件固定为0600
+_NEW_FILE_MODE = 0o666 & ~_current_umask()
+# 替换目标文件的重试：Windows上目标文件被其他进程打开时os.replace会抛PermissionError
+_REPLACE_MAX_RETRIES = 5
+_REPLACE_RETRY_DELAY = 0.5
 
 
 class FileService:
@@ -21,34 +43,80 @@ class FileService:
         Args:
             file_path: JSON文件路径
             max_retries: 最大重试次数
-            retry_delay: 重试间隔（秒）
+            retry_delay: 重试间隔上限（秒），间隔从10ms起指数增长
         
         Returns:
             解析后的JSON数据，如果读取失败返回None
         """
+        delay = min(0.01, retry_delay)
         for attempt in range(max_retries):
-            if not os.path.exists(file_path):
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    continue
-                return None
-            
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return data
+                return FileService._decode_json(Path(file_path).read_bytes())
+            except FileNotFoundError:
+                if attempt == max_retries - 1:
+                    return None
             except (json.JSONDecodeError, IOError, ValueError) as e:
                 if attempt == max_retries - 1:
                     print(f"Failed to read JSON file {file_path} after {max_retries} attempts: {e}")
                     return None
-                time.sleep(retry_delay)
+            time.sleep(delay)
+            delay = min(delay * 2, retry_delay)
         
         return None
     
+    @staticmethod
+    def _decode_json(raw: bytes) -> Any:
+        """解析JSON字节数据；orjson不接受的内容（如NaN）回退到json"""
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(raw.decode("utf-8"))
+    
+    @staticmethod
+    def _atomic_write(file_path: str, payload: bytes) -> None:
+        """先写入同目录下的临时文件再替换目标文件，避免读取到写了一半的文件"""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(file_path) or ".",
+            prefix=os.path.basename(file_path) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            # 保留已有文件的权限，新文件使用默认权限，而不是临时文件的0600
+            try:
+                mode = os.stat(file_path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = _NEW_FILE_MODE
+            os.chmod(tmp_path, mode)
+            FileService._replace_with_retry(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    @staticmethod
+    def _replace_with_retry(src: str, dst: str) -> None:
+        """os.replace，PermissionError时重试（间隔从10ms起指数增长）"""
+        delay = 0.01
+        for attempt in range(_REPLACE_MAX_RETRIES):
+            try:
+                os.replace(src, dst)
+                return
+            except PermissionError:
+                if attempt == _REPLACE_MAX_RETRIES - 1:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, _REPLACE_RETRY_DELAY)
+    
     @staticmethod
     def write_json(file_path: str, data: Dict[str, Any], ensure_ascii: bool = False, indent: int = 4) -> bool:
         """写入JSON文件
         
+        安装了orjson且无需ASCII转义时使用orjson编码（带缩进时固定为2空格），否则回退到json
+        
         Args:
             file_path: JSON文件路径
             data: 要写入的数据
@@ -58,15 +126,42 @@ class FileService:
         Returns:
             是否成功写入
         """
+        encoded = None
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            if orjson is not None and not ensure_ascii:
+                option = orjson.OPT_NON_STR_KEYS
+                if indent:
+                    option |= orjson.OPT_INDENT_2
+                try:
+                    encoded = orjson.dumps(data, option=option)
+                except TypeError:
+                    encoded = None
+            if encoded is None:
+                encoded = json.dumps(data, ensure_ascii=ensure_ascii, indent=indent).encode("utf-8")
+        except Exception as e:
+            print(f"Failed to write JSON file {file_path}: {e}")
+            return False
+        return FileService.write_bytes(file_path, encoded)
+    
+    @staticmethod
+    def write_bytes(file_path: str, payload: bytes) -> bool:
+        """写入已编码的数据（如orjson的输出），避免重复编码
+        
+        Args:
+            file_path: 文件路径
+            payload: 要写入的字节数据
             
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=ensure_ascii, indent=indent)
+        Returns:
+            是否成功写入
+        """
+        try:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            FileService._atomic_write(file_path, payload)
             return True
         except Exception as e:
-            print(f"Failed to write JSON file {file_path}: {e}")
+            print(f"Failed to write file {file_path}: {e}")
             return False
     
     @staticmethod
@@ -79,12 +174,8 @@ class FileService:
         Returns:
             清理后的文件名
         """
-        invalid = '<>:"/\\|?*'
-        sanitized = ''.join(ch for ch in filename if ch not in invalid)
-        sanitized = sanitized.strip()
-        if len(sanitized) == 0:
-            sanitized = "Unknown"
-        return sanitized
+        sanitized = filename.translate(_INVALID_FILENAME_TABLE).strip()
+        return sanitized or "Unknown"
     
     @staticmethod
     def file_exists(file_path: str) -> bool:
@@ -1,10 +1,26 @@
 """日志服务"""
 import os
 import json
-from typing import Optional, Dict, Any
+import time
+import queue
+import hashlib
+import weakref
+import threading
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 import stat
 from .file_service import FileService
+from .response_cache import ResponseCache, default_cache_path, request_translations
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 中文步骤日志的翻译按批合并为一次LLM请求：凑满条数或等待超时即发送
+_TRANSLATE_BATCH_SIZE = 4
+_TRANSLATE_BATCH_WAIT = 2.0
+# 翻译队列中的标记：立即发送当前批次
+_FLUSH = object()
 
 
 class LogService:
@@ -24,6 +40,13 @@ class LogService:
         if self.output_lang != "zh":
             self.output_lang = "en"
         self._translate_cache: Dict[str, str] = {}
+        # 翻译结果的磁盘缓存（跨运行复用）与后台批量翻译线程（首次需要时启动）
+        self._translate_store = (
+            ResponseCache(default_cache_path("translations.db"))
+            if self.output_lang == "zh" and translator_provider else None
+        )
+        self._translate_queue: Optional[queue.Queue] = None
+        self._translator: Optional[threading.Thread] = None
         FileService.ensure_dir(log_dir)
         
         # 创建子目录
@@ -34,8 +57,126 @@ class LogService:
         FileService.ensure_dir(self.terminallog_dir)
         FileService.ensure_dir(self.steps_dir)
         
-        # 初始化聊天日志
+        # 初始化聊天日志：写入由后台线程批量完成（首次追加时启动）
         self.chat_log_path = os.path.join(self.chat_dir, "chat_log.jsonl")
+        self._chat_queue: Optional[queue.Queue] = None
+        self._chat_writer: Optional[threading.Thread] = None
+        self._chat_lock = threading.Lock()
+        # 未调用close时的兜底：实例被回收或解释器退出时写完队列并停止后台线程（close时解除）
+        self._finalizers: List[weakref.finalize] = []
+
+    def _ensure_chat_writer(self) -> queue.Queue:
+        with self._chat_lock:
+            if self._chat_writer is None:
+                self._chat_queue = queue.Queue()
+                self._chat_writer = threading.Thread(
+                    target=self._chat_writer_loop,
+                    args=(self._chat_queue,),
+                    name="chat-log-writer",
+                    daemon=True
+                )
+                self._chat_writer.start()
+                self._finalizers.append(
+                    weakref.finalize(self, LogService._stop_worker, self._chat_queue, self._chat_writer)
+                )
+            return self._chat_queue
+
+    def _chat_writer_loop(self, chat_queue: queue.Queue) -> None:
+        """取出队列中已有的全部行，一次写入并flush（web端可实时读取）；收到None时退出"""
+        with open(self.chat_log_path, 'ab') as f:
+            while True:
+                batch = [chat_queue.get()]
+                try:
+                    while True:
+                        batch.append(chat_queue.get_nowait())
+                except queue.Empty:
+                    pass
+                try:
+                    f.writelines(line for line in batch if line is not None)
+                    f.flush()
+                except OSError as e:
+                    print(f"Failed to write chat log {self.chat_log_path}: {e}")
+                finally:
+                    for _ in batch:
+                        chat_queue.task_done()
+                if None in batch:
+                    return
+
+    def _ensure_translator(self) -> queue.Queue:
+        with self._chat_lock:
+            if self._translator is None:
+                self._translate_queue = queue.Queue()
+                self._translator = threading.Thread(
+                    target=self._translation_loop,
+                    args=(self._translate_queue,),
+                    name="step-log-translator",
+                    daemon=True
+                )
+                self._translator.start()
+                self._finalizers.append(
+                    weakref.finalize(self, LogService._stop_worker, self._translate_queue, self._translator)
+                )
+            return self._translate_queue
+
+    def _translation_loop(self, translate_queue: queue.Queue) -> None:
+        """凑批翻译步骤响应并写入 .zh.json；收到None时退出"""
+        while True:
+            batch = [translate_queue.get()]
+            deadline = time.monotonic() + _TRANSLATE_BATCH_WAIT
+            while batch[-1] is not None and batch[-1] is not _FLUSH and len(batch) < _TRANSLATE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(translate_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            jobs = [item for item in batch if item is not None and item is not _FLUSH]
+            try:
+                if jobs:
+                    translations = self._translate_batch([data.get("response") for _, data in jobs])
+                    for (zh_file, data), text in zip(jobs, translations):
+                        self._write_readonly_json(zh_file, {**data, "response": text})
+            except Exception as e:
+                print(f"Failed to write translated step logs: {e}")
+            finally:
+                for _ in batch:
+                    translate_queue.task_done()
+            if None in batch:
+                return
+
+    def flush(self) -> None:
+        """等待待翻译的步骤日志和已追加的聊天日志全部写入文件"""
+        translate_queue = self._translate_queue
+        if translate_queue is not None:
+            translate_queue.put(_FLUSH)
+            translate_queue.join()
+        chat_queue = self._chat_queue
+        if chat_queue is not None:
+            chat_queue.join()
+
+    def close(self) -> None:
+        """写完剩余的步骤翻译和聊天日志，并停止后台线程"""
+        with self._chat_lock:
+            translate_queue, translator = self._translate_queue, self._translator
+            chat_queue, writer = self._chat_queue, self._chat_writer
+            self._translate_queue = None
+            self._translator = None
+            self._chat_queue = None
+            self._chat_writer = None
+            finalizers, self._finalizers = self._finalizers, []
+        for finalizer in finalizers:
+            finalizer.detach()
+        if translator is not None:
+            self._stop_worker(translate_queue, translator)
+        if writer is not None:
+            self._stop_worker(chat_queue, writer)
+
+    @staticmethod
+    def _stop_worker(work_queue: queue.Queue, worker: threading.Thread) -> None:
+        """发送结束标记并等待后台线程处理完队列后退出"""
+        work_queue.put(None)
+        worker.join()
 
     def _translate(self, text: str) -> str:
         if self.output_lang != "zh" or not self.translator_provider:
@@ -45,6 +186,10 @@ class LogService:
             return ""
         if t in self._translate_cache:
             return self._translate_cache[t]
+        stored = self._translate_store.get(self._translate_key(t))
+        if stored is not None:
+            self._translate_cache[t] = stored
+            return stored
         prompt = (
             "Translate to Chinese. Keep any JSON, code, filenames/paths, coordinates, and adb/hdc commands unchanged. "
             "Do not add or remove information. Output only the translated text.\n\n"
@@ -53,11 +198,50 @@ class LogService:
         try:
             out, _, _ = self.translator_provider.predict(prompt)
             r = (out or "").strip() or t
+            if (out or "").strip():
+                self._translate_store.put(self._translate_key(t), r)
         except Exception:
             r = t
         self._translate_cache[t] = r
         return r
 
+    @staticmethod
+    def _translate_key(text: str) -> str:
+        return hashlib.sha256(f"zh|{text}".encode("utf-8")).hexdigest()
+
+    def _translate_batch(self, texts: List[Optional[str]]) -> List[str]:
+        """批量翻译：未缓存的文本合并为一次LLM请求；结果无法按编号拆分时逐条翻译
+
+        Args:
+            texts: 待翻译文本列表
+
+        Returns:
+            与texts一一对应的译文
+        """
+        if self.output_lang != "zh" or not self.translator_provider:
+            return [text or "" for text in texts]
+        stripped = [(text or "").strip() for text in texts]
+        pending = [t for t in dict.fromkeys(stripped) if t and t not in self._translate_cache]
+        if pending:
+            stored = self._translate_store.get_many(self._translate_key(t) for t in pending)
+            missing = []
+            for t in pending:
+                cached = stored.get(self._translate_key(t))
+                if cached is None:
+                    missing.append(t)
+                else:
+                    self._translate_cache[t] = cached
+            translations = request_translations(self.translator_provider, missing, "zh") if len(missing) > 1 else None
+            if translations is None:
+                for t in missing:
+                    self._translate(t)
+            else:
+                self._translate_cache.update(translations)
+                self._translate_store.put_many(
+                    {self._translate_key(t): r for t, r in translations.items()}
+                )
+        return [self._translate_cache.get(t, t) if t else "" for t in stripped]
+
     def _write_readonly_json(self, file_path: str, data: Dict[str, Any]) -> None:
         if os.path.exists(file_path):
             try:
@@ -93,9 +277,15 @@ class LogService:
         if extra:
             entry.update(extra)
         
-        with open(self.chat_log_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(entry, ensure_ascii=False))
-            f.write("\n")
+        line = None
+        if orjson is not None:
+            try:
+                line = orjson.dumps(entry) + b"\n"
+            except TypeError:
+                line = None
+        if line is None:
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        self._ensure_chat_writer().put(line)
     
     def save_step_message(
         self,
@@ -133,11 +323,11 @@ class LogService:
         FileService.write_json(message_file, message_data)
         if self.output_lang == "zh":
             zh_file = os.path.join(step_dir, f"{agent_name}.zh.json")
-            zh_data = {
-                **message_data,
-                "response": self._translate(response),
-            }
-            self._write_readonly_json(zh_file, zh_data)
+            if self.translator_provider:
+                # 由后台线程凑批翻译后写入
+                self._ensure_translator().put((zh_file, dict(message_data)))
+            else:
+                self._write_readonly_json(zh_file, {**message_data, "response": self._translate(response)})
         return message_file
     
     def save_terminal_log(self, content: str) -> str:
@@ -1,6 +1,49 @@
 import os
-from typing import Optional, Dict, Any
+import re
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List
 from .file_service import FileService
+from .response_cache import (
+    ResponseCache, default_cache_path, request_translations, TRANSLATE_LANG_NAMES, TRANSLATE_RULES
+)
+
+
+@dataclass(slots=True)
+class SubgoalRecord:
+    """script.json中的一条子目标记录（保存时才转换为dict）"""
+    subgoal: str
+    opter: str
+    last: str = ""
+    next: str = ""
+    mode: str = ""
+    mark: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为script.json中的记录格式"""
+        info: Dict[str, Any] = {
+            "opter": self.opter,
+            "picture": [
+                {"last": self.last, "next": self.next}
+            ]
+        }
+        if self.mode:
+            info["mode"] = self.mode
+        if self.mark:
+            info["mark"] = self.mark
+        return {"subgoal": self.subgoal, "info": info}
+
+
+_TRANSLATE_STYLE = "concisely without changing meaning"
+# 翻译提示词前缀（按目标语言预先拼好，调用时只追加原文）
+_TRANSLATE_PROMPT_PREFIX = {
+    lang: f"Translate to {name} {_TRANSLATE_STYLE}. {TRANSLATE_RULES}Output only the translated text.\n\n"
+    for lang, name in TRANSLATE_LANG_NAMES.items()
+}
+# 译为中文时，不含连续3个以上拉丁字母的文本（已是中文、数字、坐标等）无需翻译
+_LATIN_WORD_RE = re.compile(r"[A-Za-z]{3,}")
 
 
 class ReportService:
@@ -11,7 +54,12 @@ class ReportService:
             self.output_lang = "zh"
         else:
             self.output_lang = "en"
-        self._cache: Dict[str, str] = {}
+        # 翻译结果按 (目标语言, 文本) 做LRU缓存：容量有限，长时间运行不会无限增长；每个实例各自一份
+        self._translate_cached = functools.lru_cache(maxsize=256)(self._translate_impl)
+        # 磁盘缓存跨运行复用译文，相同的报告文本不再重复调用LLM
+        self._translate_store = (
+            ResponseCache(default_cache_path("report_translations.db")) if translator_provider else None
+        )
         self._term_map = {
             "component-not-found": "未找到组件",
             "navigation-timeout": "页面导航超时",
@@ -20,30 +68,86 @@ class ReportService:
             "unknown-failure": "未知失败"
         }
 
-    def _translate(self, text: str, target_lang: str) -> str:
-        key = f"{target_lang}:{text}"
-        if key in self._cache:
-            return self._cache[key]
+    def _needs_translation(self, text: str, target_lang: str) -> bool:
         if not text or not self.translator_provider or target_lang not in ("zh", "en"):
+            return False
+        # 空白文本和已是目标语言的文本无需调用LLM
+        if text.isspace():
+            return False
+        if target_lang == "en" and text.isascii():
+            return False
+        if target_lang == "zh" and text not in self._term_map and not _LATIN_WORD_RE.search(text):
+            return False
+        return True
+
+    def _translate(self, text: str, target_lang: str) -> str:
+        if not self._needs_translation(text, target_lang):
             return text or ""
+        return self._translate_cached(target_lang, text)
+
+    def _translate_impl(self, target_lang: str, text: str) -> str:
         if text in self._term_map and target_lang == "zh":
-            r = self._term_map[text]
-            self._cache[key] = r
-            return r
-        prompt = (
-            f"Translate to {('Chinese' if target_lang=='zh' else 'English')} concisely without changing meaning. "
-            "Keep any JSON, code, filenames/paths, coordinates, and adb/hdc commands unchanged. "
-            "Do not add or remove information. Output only the translated text.\n\n"
-            f"{text}"
-        )
+            return self._term_map[text]
+        store = self._translate_store
+        key = self._translate_key(target_lang, text)
+        stored = store.get(key) if store is not None else None
+        if stored is not None:
+            return stored
+        prompt = _TRANSLATE_PROMPT_PREFIX[target_lang] + text
         try:
             out, _, _ = self.translator_provider.predict(prompt)
             r = (out or "").strip()
+            if r and store is not None:
+                store.put(key, r)
         except Exception:
             r = text
-        self._cache[key] = r
         return r
 
+    @staticmethod
+    def _translate_key(target_lang: str, text: str) -> str:
+        return hashlib.sha256(f"{target_lang}|{text}".encode("utf-8")).hexdigest()
+
+    def _translate_many(self, texts: List[str], target_lang: str) -> List[str]:
+        """翻译多段文本：去重并跳过无需翻译/已缓存的文本，其余合并为一次LLM请求；
+        结果无法按编号拆分时改为并发逐条翻译
+
+        Args:
+            texts: 待翻译文本列表
+            target_lang: 目标语言
+
+        Returns:
+            与texts一一对应的译文
+        """
+        unique = list(dict.fromkeys(texts))
+        translated = {t: t or "" for t in unique if not self._needs_translation(t, target_lang)}
+        if target_lang == "zh":
+            translated.update({t: self._term_map[t] for t in unique if t not in translated and t in self._term_map})
+        pending = [t for t in unique if t not in translated]
+        if pending:
+            store = self._translate_store
+            keys = {t: self._translate_key(target_lang, t) for t in pending}
+            stored = store.get_many(keys.values()) if store is not None else {}
+            missing = []
+            for t in pending:
+                if keys[t] in stored:
+                    translated[t] = stored[keys[t]]
+                else:
+                    missing.append(t)
+            batch = (
+                request_translations(self.translator_provider, missing, target_lang, _TRANSLATE_STYLE)
+                if len(missing) > 1 else None
+            )
+            if batch is not None:
+                translated.update(batch)
+                if store is not None:
+                    store.put_many({keys[t]: r for t, r in batch.items()})
+            elif len(missing) > 1:
+                with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+                    translated.update(zip(missing, pool.map(lambda t: self._translate(t, target_lang), missing)))
+            else:
+                translated.update((t, self._translate(t, target_lang)) for t in missing)
+        return [translated[t] for t in texts]
+
     def save_task_results(
         self,
         run_dir: str,
@@ -90,18 +194,17 @@ class ReportService:
         subgoals: list
     ) -> str:
         script_path = os.path.join(run_dir, "script.json")
+        subgoals = [sg.to_dict() if isinstance(sg, SubgoalRecord) else sg for sg in subgoals or []]
         if self.output_lang == "zh":
-            translated_subgoals = []
-            for sg in subgoals or []:
-                if isinstance(sg, dict):
-                    tsg = dict(sg)
-                    if "subgoal" in tsg:
-                        tsg["subgoal"] = self._translate(str(tsg.get("subgoal") or ""), "zh")
-                    translated_subgoals.append(tsg)
-                else:
-                    translated_subgoals.append(sg)
+            # 总计划和各子目标一起翻译：先记下待译子目标的位置，一次批量翻译后按位置写回
+            translated_subgoals = [dict(sg) if isinstance(sg, dict) else sg for sg in subgoals]
+            positions = [i for i, sg in enumerate(translated_subgoals) if isinstance(sg, dict) and "subgoal" in sg]
+            texts = [total_plan or ""] + [str(translated_subgoals[i]["subgoal"] or "") for i in positions]
+            translated_plan, *translated_texts = self._translate_many(texts, "zh")
+            for i, text in zip(positions, translated_texts):
+                translated_subgoals[i]["subgoal"] = text
             script_data = {
-                "total_plan": self._translate(total_plan or "", "zh"),
+                "total_plan": translated_plan,
                 "subgoals": translated_subgoals
             }
         else:
@@ -0,0 +1,125 @@
+"""LLM响应的磁盘缓存：SQLite存储，跨运行复用；以及日志/报告共用的批量翻译请求"""
+import os
+import re
+import time
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional
+
+
+# 翻译目标语言名称与通用要求（日志、报告的翻译提示词共用）
+TRANSLATE_LANG_NAMES = {"zh": "Chinese", "en": "English"}
+TRANSLATE_RULES = (
+    "Keep any JSON, code, filenames/paths, coordinates, and adb/hdc commands unchanged. "
+    "Do not add or remove information. "
+)
+# 批量翻译时各段文本以 <<<编号>>> 分隔
+_TRANSLATE_ITEM_MARK = re.compile(r"<<<(\d+)>>>")
+
+
+def default_cache_path(file_name: str) -> str:
+    """缓存文件的默认位置：~/.scenagent/<file_name>"""
+    return os.path.join(os.path.expanduser("~"), ".scenagent", file_name)
+
+
+class ResponseCache:
+    """以字符串键缓存LLM响应文本，条目超过TTL即失效
+
+    读写失败（磁盘不可写、数据库损坏等）时视为未命中，不影响调用方
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 24 * 3600):
+        """初始化缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            ttl_seconds: 条目有效期（秒）
+        """
+        self.db_path = db_path
+        self.ttl_seconds = float(ttl_seconds)
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at INTEGER NOT NULL)"
+        )
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应，未命中或已过期时返回None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """批量读取，返回命中且未过期的 {键: 响应}"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    f"SELECT key, response, created_at FROM responses WHERE key IN ({','.join('?' * len(keys))})",
+                    keys,
+                ).fetchall()
+        except (sqlite3.Error, OSError):
+            return {}
+        now = time.time()
+        return {key: response for key, response, created_at in rows if now - created_at <= self.ttl_seconds}
+
+    def put(self, key: str, response: str) -> None:
+        """写入响应"""
+        self.put_many({key: response})
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        """批量写入响应，并清理过期条目"""
+        if not items:
+            return
+        now = int(time.time())
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                    [(key, response, now) for key, response in items.items()],
+                )
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        except (sqlite3.Error, OSError) as e:
+            print(f"Failed to write response cache {self.db_path}: {e}")
+
+
+def request_translations(
+    provider, texts: List[str], target_lang: str, style: str = ""
+) -> Optional[Dict[str, str]]:
+    """一次LLM请求翻译多段文本（以 <<<编号>>> 分隔）
+
+    Args:
+        provider: 翻译用的LLM提供者（调用其predict）
+        texts: 待翻译文本（已去重）
+        target_lang: 目标语言，"zh" 或 "en"
+        style: 附加在目标语言后的翻译要求，如 "concisely without changing meaning"
+
+    Returns:
+        {原文: 译文}；请求失败或结果无法按编号拆分时返回None
+    """
+    items = "\n\n".join(f"<<<{i}>>>\n{t}" for i, t in enumerate(texts, 1))
+    target = f"{TRANSLATE_LANG_NAMES[target_lang]} {style}" if style else TRANSLATE_LANG_NAMES[target_lang]
+    prompt = (
+        f"Translate each numbered item below to {target}. {TRANSLATE_RULES}"
+        "Output every item in the same order, each starting with its marker line (e.g. <<<1>>>), "
+        "followed only by the translated text.\n\n"
+        f"{items}"
+    )
+    try:
+        out, _, _ = provider.predict(prompt)
+    except Exception:
+        return None
+    parts = _TRANSLATE_ITEM_MARK.split(out or "")
+    translated = {}
+    for i in range(1, len(parts) - 1, 2):
+        idx = int(parts[i])
+        text = parts[i + 1].strip()
+        if 1 <= idx <= len(texts) and text:
+            translated[texts[idx - 1]] = text
+    if len(translated) != len(texts):
+        return None
+    return translated
@@ -1,6 +1,7 @@
 """
 Core screen perceptor class without Worker and event system dependencies.
 """
+import asyncio
 from loguru import logger
 from typing import Optional
 
@@ -46,7 +47,8 @@ class ScreenPerceptor:
         """
         # Get screen screenshot and UI hierarchy
         screenshot_file_info, ui_hierarchy_xml = await self.screenshot_tool.get_screen()
-        screenshot_file_info.compress_image_to_jpeg()  # Compress image
+        # Compress image off the event loop so in-flight coroutines keep running
+        await asyncio.to_thread(screenshot_file_info.compress_image_to_jpeg)
         
         # Get keyboard activation status
         keyboard_status_result = await self.screenshot_tool.get_keyboard_activation_status()
@@ -16,41 +16,111 @@ except ImportError:
 
 from PIL import Image as PILImage
 
+# libjpeg-turbo bindings (SIMD color conversion/DCT); falls back to PIL's encoder when unavailable
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJPF_RGBA, TJSAMP_420
+    _TURBO_JPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _TURBO_JPEG = None
+
+_log = logger.bind(log_tag="screen_perception")
+
 
 class ScreenFileInfo:
     """Information about a screenshot file."""
-    
+
+    __slots__ = ("file_path", "file_name", "file_extra_name", "file_type", "file_build_timestamp",
+                 "_filename", "_fullpath", "_pil_cache")
+
+    # Fields the file name is built from; assigning any of them drops the memoized name/path
+    _PATH_FIELDS = frozenset(("file_path", "file_name", "file_extra_name", "file_type", "file_build_timestamp"))
+
     def __init__(self, file_path, file_name, file_type, file_build_timestamp=None):
         self.file_path = file_path
         self.file_name = file_name
         self.file_extra_name = None
         self.file_type = file_type
         self.file_build_timestamp = int(datetime.now().timestamp()) if file_build_timestamp is None else file_build_timestamp
+        # (full path, decoded image): reused while the path is unchanged
+        self._pil_cache = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in ScreenFileInfo._PATH_FIELDS:
+            object.__setattr__(self, "_filename", None)
+            object.__setattr__(self, "_fullpath", None)
+
+    def __getstate__(self):
+        # The decoded image is not carried over to copies/pickles
+        state = {name: getattr(self, name, None) for name in self.__slots__}
+        state["_pil_cache"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def clone(self):
+        """Shallow copy of the file fields (without the decoded image)."""
+        c = ScreenFileInfo(self.file_path, self.file_name, self.file_type, self.file_build_timestamp)
+        c.file_extra_name = self.file_extra_name
+        return c
 
     def set_extra_name(self, extra_name):
         self.file_extra_name = extra_name
 
     def get_screenshot_filename(self, no_type: bool = False) -> str:
-        return (f"{self.file_name}_"
-                f"{str(self.file_build_timestamp)}{'' if self.file_extra_name is None else f'_{self.file_extra_name}'}"
-                f"{''if no_type else f'.{self.file_type}'}")
+        if not no_type and self._filename is not None:
+            return self._filename
+        filename = (f"{self.file_name}_"
+                    f"{str(self.file_build_timestamp)}{'' if self.file_extra_name is None else f'_{self.file_extra_name}'}"
+                    f"{''if no_type else f'.{self.file_type}'}")
+        if not no_type:
+            object.__setattr__(self, "_filename", filename)
+        return filename
 
     def get_screenshot_fullpath(self):
-        return f"{self.file_path}/{self.get_screenshot_filename()}"
+        if self._fullpath is None:
+            object.__setattr__(self, "_fullpath", f"{self.file_path}/{self.get_screenshot_filename()}")
+        return self._fullpath
 
     def get_screenshot_PILImage_file(self):
-        return PILImage.open(self.get_screenshot_fullpath())
+        path = self.get_screenshot_fullpath()
+        if self._pil_cache is None or self._pil_cache[0] != path:
+            image = PILImage.open(path)
+            image.load()
+            self._pil_cache = (path, image)
+        return self._pil_cache[1]
 
     def get_screenshot_Image_file(self):
         if not CITLALI_AVAILABLE:
             raise ImportError("Citlali is not available. Please install it or use get_screenshot_PILImage_file() instead.")
         return Image(PILImage.open(self.get_screenshot_fullpath()))
 
+    def save_jpeg(self, image, quality=75):
+        """Encode a PIL image as JPEG to this file's path (file_type becomes 'jpeg')."""
+        self.file_type = 'jpeg'
+        self._pil_cache = None
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        if _TURBO_JPEG is None:
+            (image if image.mode == 'RGB' else image.convert('RGB')).save(
+                self.get_screenshot_fullpath(), 'JPEG', quality=quality
+            )
+            return
+        # RGBA is encoded as is (alpha ignored), no intermediate RGB copy
+        data = _TURBO_JPEG.encode(
+            np.asarray(image), quality=quality,
+            pixel_format=TJPF_RGBA if image.mode == 'RGBA' else TJPF_RGB, jpeg_subsample=TJSAMP_420
+        )
+        with open(self.get_screenshot_fullpath(), 'wb') as f:
+            f.write(data)
+
     def compress_image_to_jpeg(self, quality=50):
         with PILImage.open(self.get_screenshot_fullpath()) as img:
-            img = img.convert('RGB')
-            self.file_type = 'jpeg'
-            img.save(self.get_screenshot_fullpath(), 'JPEG', quality=quality)
+            img.load()
+            self.save_jpeg(img, quality=quality)
 
 
 class ActivityInfo:
@@ -75,7 +145,10 @@ class ScreenPerceptionInfo:
         self.use_set_of_marks_mapping = use_set_of_marks_mapping
 
         self.log_tag = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
-        logger.bind(log_tag="screen_perception").debug(f"Screen Info [{self.log_tag}]\n{self._perception_infos_to_str()}")
+        # lazy: the (possibly very large) info string is only built when DEBUG is actually emitted
+        _log.opt(lazy=True).debug(
+            "Screen Info [{}]\n{}", lambda: self.log_tag, self._perception_infos_to_str
+        )
 
     def _perception_infos_to_str(self):
         return self.infos
@@ -1,5 +1,6 @@
 import asyncio
 import json
+import re
 
 try:
     from Citlali.models.entity import ChatMessage
@@ -12,6 +13,16 @@ except ImportError:
 
 from ...core.interfaces import ModelConfig
 
+# 一次请求合并总结的元素数上限，超过时分成多批并发请求
+BATCH_SIZE = 20
+_SINGLE_PROMPT = 'This is the content of a clickable element on a cell phone, please briefly summarize it in one sentence:'
+_BATCH_PROMPT = (
+    'Below are the contents of clickable elements on a cell phone, as a JSON object mapping id to content. '
+    'Briefly summarize each element in one sentence. '
+    'Return only a JSON object mapping every id to its summary:'
+)
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
 
 class TextSummarizer:
     def __init__(self, text_summarization_model_config: ModelConfig):
@@ -36,11 +47,43 @@ class TextSummarizer:
         )
         return response.content
 
+    async def _request_batch(self, items):
+        # 多个元素合并为一次请求；回复无法解析或缺少某个id时返回None
+        payload = json.dumps({str(i): text for i, text in items}, ensure_ascii=False)
+        user_message = ChatMessage(content=[_BATCH_PROMPT + payload], type="UserMessage", source="user")
+        response = await self._model_client.create(
+            [user_message]
+        )
+        try:
+            parsed = json.loads(_CODE_FENCE_RE.sub("", response.content or ""))
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(parsed, dict):
+            return None
+        summaries = {}
+        for i, _ in items:
+            summary = parsed.get(str(i))
+            if not isinstance(summary, str) or not summary.strip():
+                return None
+            summaries[i] = summary.strip()
+        return summaries
+
+    async def _summarize_batch(self, items):
+        if len(items) > 1:
+            summaries = await self._request_batch(items)
+            if summaries is not None:
+                return summaries
+        # 单个元素或批量结果不可用时，逐个请求
+        results = await asyncio.gather(*[
+            self._request_llm(_SINGLE_PROMPT, text) for _, text in items
+        ])
+        return {i: result for (i, _), result in zip(items, results)}
+
     async def summarize_text(self, text_list):
-        prompt = 'This is the content of a clickable element on a cell phone, please briefly summarize it in one sentence:'
-        tasks = [
-            self._request_llm(prompt, text) for text in text_list
-        ]
-        results = await asyncio.gather(*tasks)
-        return {i: result for i, result in enumerate(results)}
+        results = {i: None for i in range(len(text_list))}
+        items = [(i, text) for i, text in enumerate(text_list) if len(text) > 0]
+        batches = [items[k:k + BATCH_SIZE] for k in range(0, len(items), BATCH_SIZE)]
+        for summaries in await asyncio.gather(*[self._summarize_batch(batch) for batch in batches]):
+            results.update(summaries)
+        return results
 
@@ -1,5 +1,4 @@
 import asyncio
-import concurrent
 
 try:
     from Citlali.models.entity import ChatMessage
@@ -15,6 +14,10 @@ except ImportError:
 from ...core.interfaces import ModelConfig
 from ...entity import ScreenFileInfo
 
+# 同时在途的图标描述请求上限，避免一屏几十个图标同时压到模型服务
+MAX_CONCURRENT_REQUESTS = 8
+_DESCRIBE_PROMPT = 'This image is an icon/image from a phone screen. Please briefly describe it in one sentence.'
+
 
 class VisualDescriptionGenerator:
     def __init__(self, visual_prompt_model_config: ModelConfig):
@@ -33,23 +36,30 @@ class VisualDescriptionGenerator:
         if image.image.height <= 10 or image.image.width <= 10:
             return None
 
-        user_message = ChatMessage(content=[content]+[image], type="UserMessage", source="user")
+        user_message = ChatMessage(content=[content, image], type="UserMessage", source="user")
         response = await self._model_client.create(
             [user_message]
         )
         return response.content
 
-    async def generate_visual_description(self, screenshot_file: ScreenFileInfo, image_coordinates):
-        prompt = 'This image is an icon/image from a phone screen. Please briefly describe it in one sentence.'
-        cropped_images = self._image_split(screenshot_file, image_coordinates)
+    async def generate_visual_description(self, screenshot_file: ScreenFileInfo, image_coordinates, pil_image=None):
+        cropped_images = self._image_split(screenshot_file, image_coordinates, pil_image)
+        # 每次调用各建一个信号量（asyncio.Semaphore绑定事件循环，不能跨asyncio.run复用）
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def _bounded_request(image):
+            async with semaphore:
+                return await self._request_llm(_DESCRIBE_PROMPT, image)
+
         tasks = [
-            self._request_llm(prompt, image) for image in cropped_images
+            _bounded_request(image) for image in cropped_images
         ]
         results = await asyncio.gather(*tasks)
         return {i: result for i, result in enumerate(results)}
 
-    def _image_split(self, screenshot_file: ScreenFileInfo, image_coordinates_list):
-        image = screenshot_file.get_screenshot_PILImage_file() # PILImage
+    def _image_split(self, screenshot_file: ScreenFileInfo, image_coordinates_list, pil_image=None):
+        # 调用方已解码过截图时直接复用
+        image = pil_image if pil_image is not None else screenshot_file.get_screenshot_PILImage_file() # PILImage
         # 保存分割图像的列表
         cropped_images = []
         for coordinates in image_coordinates_list:
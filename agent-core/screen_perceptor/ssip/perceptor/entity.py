@@ -1,3 +1,5 @@
+import zlib
+
 from ...entity import ScreenPerceptionInfo
 
 
@@ -6,11 +8,22 @@ class SSIPInfo(ScreenPerceptionInfo):
         self.non_visual_mode = non_visual_mode
         self.SoM_mapping = SoM_mapping
 
-        super().__init__(width, height, perception_infos, use_set_of_marks_mapping=not self.non_visual_mode)
+        # perception_infos = [ui_hierarchy_xml, page_desc]; the XML (often hundreds of KB) is only kept
+        # compressed and decoded on demand via raw_xml, so infos[0] is None
+        ui_hierarchy_xml, page_desc = perception_infos
+        self._xml_zlib = None if ui_hierarchy_xml is None else zlib.compress(ui_hierarchy_xml.encode("utf-8"), 1)
+
+        super().__init__(width, height, [None, page_desc], use_set_of_marks_mapping=not self.non_visual_mode)
+
+    @property
+    def raw_xml(self):
+        if self._xml_zlib is None:
+            return None
+        return zlib.decompress(self._xml_zlib).decode("utf-8")
 
     def _perception_infos_to_str(self):
         return f"- Raw UI Hierarchy XML:\n"\
-               f"{self.infos[0]}\n\n" \
+               f"{self.raw_xml}\n\n" \
                f"- Page Description:\n" \
                f"{self.infos[1]}\n\n"
 
@@ -1,5 +1,4 @@
-from copy import deepcopy
-
+import asyncio
 from loguru import logger
 
 from ...entity import ScreenFileInfo
@@ -11,6 +10,9 @@ from .tools import draw_transparent_boxes_with_labels
 from .screen_perception_AT import ScreenPerceptionAccessibilityTree
 from ..llm_tools.visual_description_generator import VisualDescriptionGenerator
 
+# 绑定一次即可复用（bind每次都会创建新的logger对象）
+_log = logger.bind(log_tag="screen_perception")
+
 
 class ScreenStructuredInfoPerception:
     def __init__(self, visual_prompt_model_config: Optional[ModelConfig], text_summarization_model_config: Optional[ModelConfig]):
@@ -18,8 +20,8 @@ class ScreenStructuredInfoPerception:
         self.text_summarizer = TextSummarizer(text_summarization_model_config) if text_summarization_model_config is not None else None
 
     async def get_perception_infos(self, raw_screenshot_file_info: ScreenFileInfo, ui_hierarchy_xml, non_visual_mode=False, target_app=None, use_clickable_node_summaries=True):
-        logger.bind(log_tag="screen_perception").info("Screen Perception started")
-        logger.bind(log_tag="screen_perception").debug("Analyzing Screen Accessibility Tree...")
+        _log.info("Screen Perception started")
+        _log.debug("Analyzing Screen Accessibility Tree...")
         at = ScreenPerceptionAccessibilityTree(ui_hierarchy_xml, target_app = target_app)
 
         # 确定宽高
@@ -30,7 +32,7 @@ class ScreenStructuredInfoPerception:
             SoM_mapping = None
             screenshot_file_info = raw_screenshot_file_info
         else:
-            logger.bind(log_tag="screen_perception").debug("Adding Mark to screenshots...")
+            _log.debug("Adding Mark to screenshots...")
             # 启用图像标记
             nodes_need_marked = at.get_nodes_need_marked(set_mark=True)
 
@@ -52,37 +54,39 @@ class ScreenStructuredInfoPerception:
             )
 
             # 构建新的截屏文件对象
-            screenshot_file_info = deepcopy(raw_screenshot_file_info)
+            screenshot_file_info = raw_screenshot_file_info.clone()
             screenshot_file_info.file_extra_name = "marked"
-            screenshot_image_marked.convert("RGB").save(screenshot_file_info.get_screenshot_fullpath())
+            await asyncio.to_thread(screenshot_file_info.save_jpeg, screenshot_image_marked)
 
         # 如果是非图像模式（适用于不具备视觉能力的模型）
         if non_visual_mode:
-            logger.bind(log_tag="screen_perception").debug("Fetching image node contents...")
+            _log.debug("Fetching image node contents...")
             # 补全图像节点
             if self.image_description_generator is not None:
                 node_bounds_list = at.get_nodes_need_visual_desc()
-                visual_description_map = await self.image_description_generator.generate_visual_description(raw_screenshot_file_info, node_bounds_list)
+                visual_description_map = await self.image_description_generator.generate_visual_description(
+                    raw_screenshot_file_info, node_bounds_list, pil_image=screenshot_image
+                )
                 at.set_visual_desc_to_nodes(visual_description_map)
             else:
                 raise RuntimeError("'non_visual_mode=True' requires visual_prompt_model_config, but it is not provided.")
 
             # 启用节点总结
             if use_clickable_node_summaries:
-                logger.bind(log_tag="screen_perception").debug("Summarizing clickable node contents...")
+                _log.debug("Summarizing clickable node contents...")
                 if self.text_summarizer is not None:
                     page_desc = await at.get_page_description(self.text_summarizer.summarize_text)
                 else:
-                    logger.bind(log_tag="screen_perception").error("'non_visual_mode=True' and 'use_clickable_node_summaries=True' requires text_summarization_model_config, but it is not provided.")
+                    _log.error("'non_visual_mode=True' and 'use_clickable_node_summaries=True' requires text_summarization_model_config, but it is not provided.")
                     page_desc = await at.get_page_description()
             else:
-                logger.bind(log_tag="screen_perception").warning("Clickable Node Summaries not active. Set 'use_clickable_node_summaries=True' to enable.")
+                _log.warning("Clickable Node Summaries not active. Set 'use_clickable_node_summaries=True' to enable.")
                 page_desc = await at.get_page_description()
 
         else:
-            logger.bind(log_tag="screen_perception").warning("Screen Textualized Description not active. Set 'non_visual_mode=True' to enable.")
+            _log.warning("Screen Textualized Description not active. Set 'non_visual_mode=True' to enable.")
             page_desc = None
 
-        logger.bind(log_tag="screen_perception").info("Screen Perception completed")
+        _log.info("Screen Perception completed")
         return screenshot_file_info, SSIPInfo(width, height, [ui_hierarchy_xml, page_desc], non_visual_mode, SoM_mapping=SoM_mapping)
 
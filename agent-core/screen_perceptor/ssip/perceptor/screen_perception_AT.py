@@ -48,8 +48,9 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
                 screen_bottom = max(screen_bottom, b[1][1])
         screen_area = max(1, screen_right * screen_bottom)
 
+        # 面积占比 >= 0.85（即17/20），用整数比较代替逐节点的浮点除法
         def _is_fullscreen_like(node):
-            return _area(node.get("bounds")) / screen_area >= 0.85
+            return _area(node.get("bounds")) * 20 >= screen_area * 17
 
         def _is_semantic_enough(node):
             if node.get("text"):
@@ -69,18 +70,17 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
 
         candidates = []
 
-        def walk(node):
+        # 先序遍历（显式栈，子节点逆序入栈以保持原顺序）
+        stack = list(reversed(self.at_dict))
+        while stack:
+            node = stack.pop()
             props = node.get("properties") or []
             if "clickable" in props:
                 if _should_keep_clickable(node):
                     candidates.append(("clickable", node))
             elif "scrollable" in props:
                 candidates.append(("scrollable", node))
-            for child in node.get("children", []) or []:
-                walk(child)
-
-        for at_node in self.at_dict:
-            walk(at_node)
+            stack.extend(reversed(node.get("children", []) or []))
 
         index = 0
         nodes_need_marked = {
@@ -102,8 +102,10 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
             center = node.get("center")
             if not bounds or not center:
                 continue
-            bounds_key = tuple(map(tuple, bounds))
-            center_key = tuple(center)
+            # 坐标为非负且远小于65536的像素值，按16位打包成一个整数作为去重键
+            (x1, y1), (x2, y2) = bounds
+            bounds_key = (x1 << 48) | (y1 << 32) | (x2 << 16) | y2
+            center_key = (center[0] << 16) | center[1]
             if bounds_key in seen_bounds[node_type] or center_key in seen_center[node_type]:
                 continue
             seen_bounds[node_type].add(bounds_key)
@@ -162,8 +164,9 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
     async def get_page_description(self, summarize_text_func=None):
         page_desc = []
         for at_node in self.at_dict:
-            at_node = self._common_filter(at_node, self._coordinate_filter)
-            at_node = self._common_filter(at_node, self._redundant_info_filter)
+            # 以下过滤均原地修改节点，先整体复制一次，保持self.at_dict不变
+            at_node = deepcopy(at_node)
+            at_node = self._common_filter(at_node, self._desc_prep)
             at_node = self._struct_compress(at_node)
             if summarize_text_func is not None:
                 at_node = await self._summarize_clickable_nodes(at_node, summarize_text_func)
@@ -187,29 +190,48 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
                         child[f'merged-{key}'].append(parent[key])
             return child
 
-        # 如果没有 children 或不是列表，直接返回
-        if not isinstance(node, dict):
-            return node
-        children = node.get('children')
-        if not isinstance(children, list):
-            return node
-
-        # 压缩当前节点
-        while len(children) == 1:
-            child = children[0]
-            child = merge_info(node, child)
-            node = child
-            children = node.get('children', [])
-
-        # 对每个子节点递归压缩
-        if 'children' in node:
-            node['children'] = [self._struct_compress(child) for child in node['children']]
+        # 压缩以node开头的单子节点链，返回压缩后的节点及是否需要继续处理其子节点
+        def compress(node):
+            # 如果没有 children 或不是列表，直接返回
+            if not isinstance(node, dict):
+                return node, False
+            children = node.get('children')
+            if not isinstance(children, list):
+                return node, False
+
+            # 压缩当前节点
+            while len(children) == 1:
+                child = children[0]
+                child = merge_info(node, child)
+                node = child
+                children = node.get('children', [])
+            return node, 'children' in node
+
+        # 显式栈逐层处理各子节点，原地替换子节点列表中的元素（树已由get_page_description复制；
+        # 各子树互不影响，处理顺序不改变结果）
+        node, expand = compress(node)
+        stack = [node] if expand else []
+        while stack:
+            children = stack.pop()['children']
+            for i, child in enumerate(children):
+                children[i], expand = compress(child)
+                if expand:
+                    stack.append(children[i])
 
         return node
 
     def _format_ui_tree(self, node, indent=0):
         lines = []
+        # 先序遍历（显式栈，子节点逆序入栈以保持原顺序）
+        stack = [(node, indent)]
+        while stack:
+            node, indent = stack.pop()
+            lines.append(self._format_ui_node(node, indent))
+            stack.extend((child, indent + 1) for child in reversed(node.get('children', [])))
+        return lines
 
+    @staticmethod
+    def _format_ui_node(node, indent):
         # 合并 class 信息
         base_class = node.get('class', 'Unknown')
         merged_classes = node.get('merged-class', [])
@@ -250,14 +272,13 @@ class ScreenPerceptionAccessibilityTree(ScreenAccessibilityTree):
             desc_parts.append(props_text)
 
         # 输出行
-        line = "  " * indent + "- " + " ".join(desc_parts)
-        lines.append(line)
-
-        # 递归子节点
-        for child in node.get('children', []):
-            lines.extend(self._format_ui_tree(child, indent + 1))
+        return "  " * indent + "- " + " ".join(desc_parts)
 
-        return lines
+    # [生成页面描述时] 坐标过滤和冗余信息清理在同一次遍历中完成（坐标过滤读取properties，须先于清理执行）
+    @staticmethod
+    def _desc_prep(node):
+        node = ScreenPerceptionAccessibilityTree._coordinate_filter(node)
+        return ScreenPerceptionAccessibilityTree._redundant_info_filter(node)
 
     # [生成页面描述时] 非可点击/滚动的元素无需提供坐标信息
     @staticmethod
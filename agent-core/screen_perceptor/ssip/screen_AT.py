@@ -1,10 +1,18 @@
-from copy import deepcopy
-
 import xmltodict
 import re
 
 from loguru import logger
 
+_log = logger.bind(log_tag="screen_perception")
+
+# 需要收集的节点关键属性
+_PROPERTY_KEYS = frozenset((
+    '@checkable', '@checked', '@clickable', '@enabled', '@focusable', '@focused', '@scrollable',
+    '@long-clickable', '@password', '@selected', '@visible-to-user'
+))
+# 解析形如[x1,y1][x2,y2]的bounds字符串
+_BOUNDS_RE = re.compile(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]')
+
 
 class ScreenAccessibilityTree:
     def __init__(self, at_xml: str, target_app: None):
@@ -20,15 +28,28 @@ class ScreenAccessibilityTree:
                 if '@package' in at_node and at_node['@package'] == target_app :
                     self.at_dict.append(self._node_info_collector(at_node, []))
                 else:
-                    logger.bind(log_tag="screen_perception").info(
+                    _log.info(
                         f"[Screen Perception] The nodes of package {at_node['@package']} have been ignored because the app package was specified!")
             else:
                 self.at_dict.append(self._node_info_collector(at_node, []))
         if len(self.at_dict) == 0:
-            logger.bind(log_tag="screen_perception").warning(
+            _log.warning(
                 f"[Screen Perception] The node specifying the app package {target_app} was not found in the screen.")
 
     def _node_info_collector(self, at_node, layer):
+        # 用显式栈先序遍历原始节点（避免深层级UI树的递归开销与RecursionError），子节点按原顺序挂到父节点下
+        root_info = self._node_info(at_node, layer)
+        stack = [(at_node, root_info)]
+        while stack:
+            raw_node, node_info = stack.pop()
+            node = raw_node.get('node', [])
+            for sub_node in node if isinstance(node, list) else [node]:
+                sub_info = self._node_info(sub_node, node_info['layer'] + [node_info['class']])
+                node_info['children'].append(sub_info)
+                stack.append((sub_node, sub_info))
+        return root_info
+
+    def _node_info(self, at_node, layer):
         at_node_info = {}
         # 收集类名、包名、资源ID
         at_node_info['class'] = at_node.get('@class')
@@ -39,19 +60,13 @@ class ScreenAccessibilityTree:
         # 收集关键属性(非False)
         at_node_info['properties'] = []
         for key, value in at_node.items():
-            if value and value != 'false' and key in ['@checkable', '@checked', '@clickable', '@enabled', '@focusable', '@focused', '@scrollable', '@long-clickable', '@password', '@selected', '@visible-to-user']:
+            if value and value != 'false' and key in _PROPERTY_KEYS:
                 at_node_info['properties'].append(key.replace('@', ''))
 
         # 收集坐标信息
-        bounds = at_node.get('@bounds') # 形如[x1,y1][x2,y2]的字符串
-        # 正则表达式匹配方括号内的数字
-        pattern = r'\[(\d+),(\d+)\]'
-        matches = re.findall(pattern, bounds)
-        bounds = [[int(x), int(y)] for x, y in matches] # 形如[[x1,y1],[x2,y2]]的数组
-        at_node_info['bounds'] = bounds
-        at_node_info['center'] = [ # 计算中心点坐标
-            bounds[0][0] + ((bounds[1][0] - bounds[0][0]) // 2), bounds[0][1] + ((bounds[1][1] - bounds[0][1]) // 2)
-        ]
+        x1, y1, x2, y2 = map(int, _BOUNDS_RE.match(at_node.get('@bounds')).groups())
+        at_node_info['bounds'] = [[x1, y1], [x2, y2]] # 形如[[x1,y1],[x2,y2]]的数组
+        at_node_info['center'] = [x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2] # 计算中心点坐标
 
         # 收集文本信息
         text = (at_node.get('@text') or '').replace("\n", "")
@@ -61,23 +76,25 @@ class ScreenAccessibilityTree:
 
         at_node_info['layer'] = layer
 
-        # 递归处理子节点
+        # 子节点由_node_info_collector填充
         at_node_info['children'] = []
-        node = at_node.get('node', [])
-        for sub_node in node if isinstance(node, list) else [node]:
-            at_node_info['children'].append(self._node_info_collector(sub_node, layer + [at_node_info['class']]))
-
         return at_node_info
 
     @staticmethod
     def _common_filter(node, filter):
-        node = deepcopy(node)
+        # 先父后子（先序）逐节点应用filter，原地修改并返回根节点；需要保留原树时由调用方先deepcopy整棵树
+        # 用显式栈代替递归；栈中保存(子节点列表, 下标)，filter的返回值写回该位置
         node = filter(node)
+        pending = []
 
-        if node.get('children') is not None:
-            temporary_children = []
-            for sub_node in node['children']:
-                temporary_children.append(ScreenAccessibilityTree._common_filter(sub_node, filter))
-            node['children'] = temporary_children
-        return node
+        def _push_children(parent):
+            if parent.get('children') is not None:
+                children = parent['children'] = list(parent['children'])
+                pending.extend((children, i) for i in reversed(range(len(children))))
 
+        _push_children(node)
+        while pending:
+            children, i = pending.pop()
+            children[i] = filter(children[i])
+            _push_children(children[i])
+        return node
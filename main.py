@@ -10,6 +10,7 @@ print("Main process starting...", flush=True)
 
 import json
 import time
+import asyncio
 import argparse
 import subprocess
 import io
@@ -34,7 +35,7 @@ from services.action_service import ActionService
 from services.coordinate_service import CoordinateService
 from core.state.state_manager import StateManager
 from core.orchestration.task_orchestrator import TaskOrchestrator
-from infrastructure.storage.excel_report import write_report_for_run
+from infrastructure.storage.excel_report import write_reports_for_runs_async
 from config.settings import resolve_summary_llm_params, resolve_print_device_cmd
 
 
@@ -234,6 +235,8 @@ def run_instruction(
     reflector_tree_check: str = "off",
     task_judge: str = "on",
     device_id: Optional[str] = None,
+    speculative_planner: str = "off",
+    plan_cache: str = "off",
 ) -> str:
     """运行指令（重构后的版本）
     
@@ -363,10 +366,44 @@ def run_instruction(
         enable_task_judge=(str(task_judge).strip().lower() == "on"),
         perception_mode=perception_mode,
         enable_tree_stagnation_check=enable_tree_stagnation_check,
+        enable_speculative_planning=(str(speculative_planner).strip().lower() == "on"),
+        enable_plan_cache=(str(plan_cache).strip().lower() == "on"),
     )
     
     # 运行任务
-    return orchestrator.run(instruction, max_step)
+    try:
+        return orchestrator.run(instruction, max_step)
+    finally:
+        # 先写完日志（步骤日志翻译仍需调用LLM），再关闭设备与LLM连接
+        log_service.close()
+        device_controller.close()
+        llm_provider.close()
+        if summary_llm_provider is not llm_provider:
+            summary_llm_provider.close()
+
+
+def _write_run_reports(app_id: str, runs: list, scenario_path: str, args: argparse.Namespace) -> None:
+    """写入已完成运行的报告行（多次运行时各行并发生成，每个报告文件只读写一次）
+
+    Args:
+        app_id: 应用ID
+        runs: [(run_dir, scenario_id), ...]
+    """
+    try:
+        asyncio.run(write_reports_for_runs_async(
+            runs,
+            scenario_path,
+            app_id,
+            output_lang=args.output_lang,
+            vllm_api_key=args.api_key,
+            vllm_base_url=args.base_url,
+            vllm_model_name=args.model,
+            summary_api_key=args.summary_api_key,
+            summary_base_url=args.summary_base_url,
+            summary_model_name=args.summary_model,
+        ))
+    except Exception as exc:
+        print(f"Failed to write report for app {app_id}: {exc}")
 
 
 if __name__ == '__main__':
@@ -400,6 +437,8 @@ if __name__ == '__main__':
     parser.add_argument("--planner_tricks_topk", type=int, default=0)
     parser.add_argument("--reflector_tree_check", type=str, choices=["on", "off"], default="off")
     parser.add_argument("--task_judge", type=str, choices=["on", "off"], default="off")
+    parser.add_argument("--speculative_planner", type=str, choices=["on", "off"], default="off")
+    parser.add_argument("--plan_cache", type=str, choices=["on", "off"], default="off")
     args = parser.parse_args()
     
     scenario_path = args.scenario_file
@@ -543,6 +582,8 @@ if __name__ == '__main__':
                     reflector_tree_check=args.reflector_tree_check,
                     task_judge=args.task_judge,
                     device_id=args.device_id,
+                    speculative_planner=args.speculative_planner,
+                    plan_cache=args.plan_cache,
                 )
             except Exception as exc:
                 run_error = exc
@@ -565,19 +606,8 @@ if __name__ == '__main__':
             if run_error:
                 raise run_error
             
-            write_report_for_run(
-                run_dir,
-                scenario_path,
-                current_app_id,
-                sc.get('id'),
-                output_lang=args.output_lang,
-                vllm_api_key=args.api_key,
-                vllm_base_url=args.base_url,
-                vllm_model_name=args.model,
-                summary_api_key=args.summary_api_key,
-                summary_base_url=args.summary_base_url,
-                summary_model_name=args.summary_model,
-            )
+            # 每次运行结束后立即写入该运行的报告行
+            _write_run_reports(current_app_id, [(run_dir, sc.get('id'))], scenario_path, args)
             time.sleep(2)
     else:
         raise ValueError("scenario_file not found")